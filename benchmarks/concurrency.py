@@ -0,0 +1,207 @@
+# benchmarks/concurrency.py
+# Stress check for several writer processes sharing one database file.
+#
+#   python benchmarks/concurrency.py
+#   python benchmarks/concurrency.py --processes 8 --iterations 500
+#
+# A fresh database is generated in a temporary directory, then every worker
+# process runs the same mix of short units of work (see
+# db_models.run_unit_of_work) against it at once:
+#
+#   - read-modify-write increments of a few shared course counters through
+#     the ORM, the pattern that loses updates without row versions;
+#   - grade inserts, which update the GPA summaries through triggers;
+#   - capacity-checked enrollments (db_enrollment).
+#
+# Afterwards the counters must equal their start value plus every increment
+# the workers report, the grade count must match, the GPA summaries must
+# verify, and the database must pass integrity_check. A worker still running
+# after --timeout seconds counts as a lockup. Exits non-zero on any failure;
+# tests/test_concurrency.py runs a short version.
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+
+from generate import generate
+
+STUDENTS = 500
+COURSES = 20
+# Courses whose max_students the workers increment; the rest fill up
+COUNTERS = 3
+
+
+def worker(iterations, seed):
+    """Run the unit-of-work mix and print what was committed as JSON"""
+    sys.path.insert(0, ROOT)
+    from db_enrollment import ENROLLED, enroll
+    from db_models import Course, Grade, run_unit_of_work
+
+    rng = random.Random(seed)
+    stats = {'increments': 0, 'grades': 0, 'enrolled': 0, 'attempts': 0}
+
+    def counted(fn):
+        def run(session, *args):
+            stats['attempts'] += 1
+            return fn(session, *args)
+        return run
+
+    @counted
+    def increment(session, course_id):
+        course = session.get(Course, course_id)
+        course.max_students += 1
+
+    @counted
+    def add_grade(session, student_id, course_id):
+        session.add(Grade(student_id=student_id, course_id=course_id, semester='Fall 2025',
+                          grade_point=rng.choice([1.0, 2.0, 2.7, 3.3, 4.0])))
+
+    @counted
+    def enroll_student(session, student_id, course_id):
+        return enroll(session, student_id, course_id)
+
+    started = time.perf_counter()
+    for _ in range(iterations):
+        run_unit_of_work(increment, rng.randint(1, COUNTERS), retries=50, retry_conflicts=True)
+        stats['increments'] += 1
+        run_unit_of_work(add_grade, rng.randint(1, STUDENTS), rng.randint(1, COURSES), retries=50)
+        stats['grades'] += 1
+        if run_unit_of_work(enroll_student, rng.randint(1, STUDENTS), rng.randint(1, COURSES),
+                            retries=50) == ENROLLED:
+            stats['enrolled'] += 1
+    stats['seconds'] = time.perf_counter() - started
+    print(json.dumps(stats))
+
+
+def prepare(path):
+    """Give the counter courses a start value and the others a small capacity to compete for"""
+    import sqlite3
+    connection = sqlite3.connect(path)
+    with connection:
+        connection.execute("UPDATE courses SET max_students = CASE WHEN id <= ? THEN 1000 ELSE 40 END",
+                           (COUNTERS,))
+    connection.close()
+
+
+def totals(path):
+    """(sum of counter courses' max_students, grades, enrollments) in the database at path"""
+    import sqlite3
+    connection = sqlite3.connect(path)
+    try:
+        counters = connection.execute(
+            "SELECT sum(max_students) FROM courses WHERE id <= ?", (COUNTERS,)).fetchone()[0]
+        grades = connection.execute("SELECT count(*) FROM grades").fetchone()[0]
+        enrollments = connection.execute("SELECT count(*) FROM enrollment").fetchone()[0]
+    finally:
+        connection.close()
+    return counters, grades, enrollments
+
+
+def check(path):
+    """Return the GPA summary mismatches and the integrity_check result"""
+    sys.path.insert(0, ROOT)
+    from sqlalchemy.orm import Session
+    from db_connection import make_engine
+    from db_models import upgrade_schema, verify_gpa_summaries
+
+    # db_models' own engine was bound to SCHOOL_DB_PATH when generate()
+    # imported it, so the stressed file gets an engine of its own
+    engine = make_engine(f"sqlite:///{path}")
+    upgrade_schema(engine)
+    with Session(engine) as session:
+        mismatches = verify_gpa_summaries(session)
+        integrity = session.connection().exec_driver_sql("PRAGMA integrity_check").scalar()
+    engine.dispose()
+    return mismatches, integrity
+
+
+def stress(processes, iterations, timeout, directory=None):
+    """Run the workers against a fresh database in directory (default: a new temporary one).
+
+    Returns (database path, summary line, list of failure messages).
+    """
+    directory = directory or tempfile.mkdtemp(prefix='school-concurrency-')
+    path = os.path.join(directory, 'school.db')
+    generate(path, students=STUDENTS, courses=COURSES, enrollments=2, grades=1)
+    prepare(path)
+    counters, grades, enrollments = totals(path)
+
+    env = dict(os.environ, SCHOOL_DB_PATH=path, SCHOOL_DB_SLOW_MS='off')
+    started = time.perf_counter()
+    workers = [
+        subprocess.Popen([sys.executable, os.path.abspath(__file__), '--worker', str(seed),
+                          '--iterations', str(iterations)],
+                         env=env, stdout=subprocess.PIPE, text=True)
+        for seed in range(processes)
+    ]
+    failures = []
+    results = []
+    for process in workers:
+        remaining = max(0.0, timeout - (time.perf_counter() - started))
+        try:
+            output, _ = process.communicate(timeout=remaining)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.communicate()
+            failures.append(f"worker {process.pid} still running after {timeout:.0f}s")
+            continue
+        if process.returncode != 0:
+            failures.append(f"worker {process.pid} exited with {process.returncode}")
+            continue
+        results.append(json.loads(output.strip().splitlines()[-1]))
+    elapsed = time.perf_counter() - started
+
+    committed = {name: sum(result[name] for result in results)
+                 for name in ('increments', 'grades', 'enrolled', 'attempts')}
+    units = committed['increments'] + committed['grades'] + len(results) * iterations
+    final_counters, final_grades, final_enrollments = totals(path)
+    if final_counters != counters + committed['increments']:
+        failures.append(f"lost updates: counters rose by {final_counters - counters}, "
+                        f"{committed['increments']} increments committed")
+    if final_grades != grades + committed['grades']:
+        failures.append(f"grades: {final_grades - grades} added, {committed['grades']} committed")
+    if final_enrollments != enrollments + committed['enrolled']:
+        failures.append(f"enrollments: {final_enrollments - enrollments} added, "
+                        f"{committed['enrolled']} committed")
+    mismatches, integrity = check(path)
+    if mismatches:
+        failures.append(f"{len(mismatches)} GPA summary mismatches")
+    if integrity != 'ok':
+        failures.append(f"integrity_check: {integrity}")
+
+    summary = (f"{len(results)} of {processes} workers finished {units} units of work in {elapsed:.1f}s "
+               f"({units / elapsed:.0f}/s), {committed['attempts'] - units} retried")
+    return path, summary, failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run concurrent writer processes against one database")
+    parser.add_argument('--processes', type=int, default=6)
+    parser.add_argument('--iterations', type=int, default=200, help="units of each kind per process")
+    parser.add_argument('--timeout', type=float, default=300, help="seconds before a worker counts as locked up")
+    parser.add_argument('--worker', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker is not None:
+        worker(args.iterations, args.worker)
+        return
+
+    path, summary, failures = stress(args.processes, args.iterations, args.timeout)
+    print(summary)
+    print(f"Database kept at {path}")
+    for message in failures:
+        print(f"FAILED {message}")
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
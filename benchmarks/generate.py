@@ -0,0 +1,141 @@
+# benchmarks/generate.py
+# Deterministic synthetic school database for benchmarks and manual testing.
+# The same arguments and seed always produce the same rows, written through
+# db_import so the GPA summaries and search index are maintained as usual.
+#
+#   python benchmarks/generate.py bench.db --students 10000 --courses 200
+#
+# Each student is enrolled in --enrollments distinct courses and graded in
+# --grades of them (at most one grade per enrolled course).
+import argparse
+import os
+import random
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+FIRST_NAMES = ['Ama', 'Kofi', 'Yaw', 'Efua', 'Kwame', 'Abena', 'John', 'Mary', 'Peter', 'Grace',
+               'Joseph', 'Akosua', 'Esi', 'Kojo', 'Adwoa', 'Daniel', 'Sarah', 'Michael', 'Linda', 'Samuel']
+LAST_NAMES = ['Mensah', 'Owusu', 'Boateng', 'Asante', 'Addo', 'Osei', 'Darko', 'Agyeman', 'Smith', 'Johnson',
+              'Appiah', 'Ofori', 'Amoah', 'Badu', 'Quaye', 'Tetteh', 'Nkrumah', 'Lartey', 'Brown', 'Williams']
+SUBJECTS = ['Algebra', 'Biology', 'Chemistry', 'Databases', 'Economics', 'French', 'Geography', 'History',
+            'Literature', 'Mechanics', 'Networks', 'Physics', 'Statistics', 'Programming', 'Accounting']
+SEMESTERS = ['Fall 2022', 'Spring 2023', 'Fall 2023', 'Spring 2024', 'Fall 2024', 'Spring 2025']
+GRADE_POINTS = [4.0, 3.7, 3.3, 3.0, 2.7, 2.3, 2.0, 1.7, 1.3, 1.0, 0.0]
+
+# Named sizes used by the benchmark suite
+SCALES = {
+    'small': dict(students=1000, courses=50, enrollments=5, grades=4),
+    'medium': dict(students=10000, courses=200, enrollments=6, grades=5),
+    'large': dict(students=50000, courses=500, enrollments=8, grades=6),
+}
+
+
+def student_rows(students):
+    rng = random.Random(1)
+    for i in range(students):
+        first_name, last_name = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        yield i + 1, {
+            'student_number': f"S{i:07d}",
+            'first_name': first_name,
+            'last_name': last_name,
+            'email': f"{first_name}.{last_name}.{i}@school.example".lower(),
+            'date_of_birth': f"{rng.randint(1995, 2006)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+        }
+
+
+def course_rows(courses):
+    rng = random.Random(2)
+    for i in range(courses):
+        yield i + 1, {
+            'course_code': f"C{i:04d}",
+            'title': f"{rng.choice(SUBJECTS)} {100 + i}",
+            'credits': rng.randint(1, 4),
+        }
+
+
+def enrollment_plan(students, courses, enrollments, seed):
+    """Yield (student number, [course codes]) for every student"""
+    rng = random.Random(seed)
+    codes = [f"C{i:04d}" for i in range(courses)]
+    for i in range(students):
+        yield f"S{i:07d}", rng.sample(codes, min(enrollments, courses))
+
+
+def enrollment_rows(students, courses, enrollments, seed):
+    line = 0
+    for number, codes in enrollment_plan(students, courses, enrollments, seed):
+        for code in codes:
+            line += 1
+            yield line, {'student_number': number, 'course_code': code}
+
+
+def grade_rows(students, courses, enrollments, grades, seed):
+    rng = random.Random(seed + 1)
+    line = 0
+    for number, codes in enrollment_plan(students, courses, enrollments, seed):
+        for code in codes[:grades]:
+            line += 1
+            yield line, {
+                'student_number': number,
+                'course_code': code,
+                'semester': rng.choice(SEMESTERS),
+                'grade_point': rng.choice(GRADE_POINTS),
+            }
+
+
+def generate(path, students, courses, enrollments, grades, seed=42, progress=None):
+    """Create a fresh database at path filled with synthetic records"""
+    from sqlalchemy.orm import Session
+    from db_connection import archive_path_for, make_engine
+    from db_import import import_rows
+    from db_models import upgrade_schema
+
+    url = f"sqlite:///{path}"
+    archive = archive_path_for(url)
+    for base in (path, archive) if archive else (path,):
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(base + suffix):
+                os.remove(base + suffix)
+    engine = make_engine(url)
+    upgrade_schema(engine)
+    with Session(bind=engine) as session:
+        for kind, rows in (
+            ('students', student_rows(students)),
+            ('courses', course_rows(courses)),
+            ('enrollments', enrollment_rows(students, courses, enrollments, seed)),
+            ('grades', grade_rows(students, courses, enrollments, grades, seed)),
+        ):
+            result = import_rows(session, kind, rows, progress=progress)
+            if result.rejected:
+                raise RuntimeError(f"{result.rejected} generated {kind} were rejected")
+    engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a deterministic synthetic school database")
+    parser.add_argument('path', help="database file to create (replaced if it exists)")
+    parser.add_argument('--scale', choices=SCALES, help="preset sizes; explicit options override them")
+    parser.add_argument('--students', type=int)
+    parser.add_argument('--courses', type=int)
+    parser.add_argument('--enrollments', type=int, help="courses per student")
+    parser.add_argument('--grades', type=int, help="graded courses per student")
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    sizes = dict(SCALES[args.scale or 'small'])
+    for name in sizes:
+        if getattr(args, name) is not None:
+            sizes[name] = getattr(args, name)
+
+    def report(result):
+        print(f"\r{result.kind}: {result.imported}", end='', file=sys.stderr)
+
+    generate(args.path, seed=args.seed, progress=report, **sizes)
+    print(f"\rGenerated {args.path}: " + ", ".join(f"{name}={value}" for name, value in sizes.items()),
+          file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
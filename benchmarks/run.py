@@ -0,0 +1,253 @@
+# benchmarks/run.py
+# Benchmark suite for the data and GUI hot paths, at several database scales.
+#
+#   python benchmarks/run.py                    # small and medium, compare with the baselines
+#   python benchmarks/run.py --scales large
+#   python benchmarks/run.py --save-baseline    # record the current numbers as the baselines
+#
+# Databases are generated once per scale into benchmarks/data/ (see
+# generate.py) and reused while the generator settings are unchanged. Each
+# scale runs in a fresh interpreter pointed at its database, with the GUI on
+# Qt's offscreen platform. Every benchmark reports its median time over
+# --repeat runs and the number of SQL statements one run executes.
+#
+# A benchmark regresses when its statement count goes up at all compared
+# with baseline.json, which is committed and holds only statement counts.
+# Timings are machine-specific, so they are kept in baseline.local.json,
+# which is not committed: once --save-baseline has written it on a machine,
+# a benchmark also regresses there when its time exceeds the recorded one by
+# more than --tolerance (a fraction) and by more than --min-delta seconds,
+# so timer noise on very fast paths is ignored. Without a local baseline
+# times are shown but not compared. Exits non-zero if anything regressed.
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+
+from generate import SCALES, generate
+
+DATA_DIR = os.path.join(HERE, 'data')
+BASELINE_PATH = os.path.join(HERE, 'baseline.json')
+LOCAL_BASELINE_PATH = os.path.join(HERE, 'baseline.local.json')
+
+# Students timed one at a time through the per-student GPA methods
+SAMPLE_STUDENTS = 200
+SAMPLE_SEMESTER = 'Fall 2024'
+
+
+class StatementCounter:
+    """Counts statements executed on an engine, from any thread"""
+
+    def __init__(self, engine):
+        from sqlalchemy import event
+        self.count = 0
+        self.lock = threading.Lock()
+        event.listen(engine, 'before_cursor_execute', self.executed)
+
+    def executed(self, *args):
+        with self.lock:
+            self.count += 1
+
+
+def data_benchmarks():
+    """Return {name: fn} timing the GPA calculations"""
+    import random
+    from db_models import Student, calculate_cgpas, open_session
+
+    session = open_session()
+    student_ids = [student_id for student_id, in session.query(Student.id)]
+    sample = random.Random(7).sample(student_ids, min(SAMPLE_STUDENTS, len(student_ids)))
+    students = session.query(Student).filter(Student.id.in_(sample)).all()
+
+    def cgpa_each():
+        for student in students:
+            student.calculate_cgpa(session)
+
+    def semester_gpa_each():
+        for student in students:
+            student.calculate_semester_gpa(session, SAMPLE_SEMESTER)
+
+    def cgpa_all():
+        calculate_cgpas(session)
+
+    return {
+        f'calculate_cgpa x{len(students)}': cgpa_each,
+        f'calculate_semester_gpa x{len(students)}': semester_gpa_each,
+        'calculate_cgpas (all students)': cgpa_all,
+    }
+
+
+def gui_benchmarks():
+    """Return ({name: fn}, objects to keep alive) timing each table's refresh in a headless main window"""
+    from PyQt5.QtWidgets import QApplication
+    from gui_main import SchoolManagementSystem
+
+    app = QApplication.instance() or QApplication(sys.argv[:1])
+    window = SchoolManagementSystem()
+    for index in range(window.tabs.count()):
+        window.show_tab(index)
+    window.db.wait()
+
+    def refresh(method):
+        def run():
+            method()
+            window.db.wait()
+        return run
+
+    benchmarks = {
+        'refresh_students': refresh(window.refresh_students),
+        'refresh_courses': refresh(window.refresh_courses),
+        'refresh_enrollments': refresh(window.refresh_enrollments),
+        'refresh_grades': refresh(window.refresh_grades),
+    }
+    benchmarks['refresh_all_data'] = refresh(window.refresh_all_data)
+    # The caller keeps the application and window alive while timing
+    return benchmarks, (app, window)
+
+
+def child(repeat):
+    """Run every benchmark against SCHOOL_DB_PATH and print the results as JSON"""
+    sys.path.insert(0, ROOT)
+    from db_models import engine, ensure_schema
+
+    ensure_schema()
+    counter = StatementCounter(engine)
+    benchmarks = data_benchmarks()
+    gui, keep_alive = gui_benchmarks()
+    benchmarks.update(gui)
+
+    results = {}
+    for name, fn in benchmarks.items():
+        fn()  # warm up caches
+        times = []
+        statements = 0
+        for _ in range(repeat):
+            before = counter.count
+            started = time.perf_counter()
+            fn()
+            times.append(time.perf_counter() - started)
+            statements = max(statements, counter.count - before)
+        results[name] = {'seconds': statistics.median(times), 'statements': statements}
+    print(json.dumps(results))
+
+
+def database_for(scale, data_dir):
+    """Path of the generated database for a scale, generating it if needed"""
+    os.makedirs(data_dir, exist_ok=True)
+    path = os.path.join(data_dir, f'{scale}.db')
+    settings_path = path + '.json'
+    settings = json.dumps(SCALES[scale], sort_keys=True)
+    if os.path.exists(path) and os.path.exists(settings_path):
+        with open(settings_path) as f:
+            if f.read() == settings:
+                return path
+    print(f"Generating {scale} database...", file=sys.stderr)
+    generate(path, **SCALES[scale])
+    with open(settings_path, 'w') as f:
+        f.write(settings)
+    return path
+
+
+def run_scale(scale, data_dir, repeat):
+    env = dict(os.environ, QT_QPA_PLATFORM='offscreen', SCHOOL_DB_PATH=database_for(scale, data_dir))
+    output = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), '--child', '--repeat', str(repeat)],
+        env=env, check=True, capture_output=True, text=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def load_baseline(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_baseline(path, baseline, results, fields):
+    for scale, benchmarks in results.items():
+        baseline[scale] = {name: {field: result[field] for field in fields} for name, result in benchmarks.items()}
+    with open(path, 'w') as f:
+        json.dump(baseline, f, indent=2, sort_keys=True)
+        f.write('\n')
+
+
+def compare(results, baseline, timings, tolerance, min_delta):
+    """Return a list of regression messages: statement counts against baseline, times against timings"""
+    regressions = []
+    for scale, benchmarks in results.items():
+        for name, result in benchmarks.items():
+            expected = baseline.get(scale, {}).get(name)
+            if expected is not None and result['statements'] > expected['statements']:
+                regressions.append(f"{scale} {name}: {result['statements']} statements "
+                                   f"(baseline {expected['statements']})")
+            expected = timings.get(scale, {}).get(name)
+            if expected is None:
+                continue
+            slower = result['seconds'] - expected['seconds']
+            if slower > min_delta and result['seconds'] > expected['seconds'] * (1 + tolerance):
+                regressions.append(f"{scale} {name}: {result['seconds'] * 1000:.1f} ms "
+                                   f"(baseline {expected['seconds'] * 1000:.1f} ms)")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the data and GUI hot paths")
+    parser.add_argument('--scales', nargs='+', choices=SCALES, default=['small', 'medium'])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--data-dir', default=DATA_DIR, help="where generated databases are kept")
+    parser.add_argument('--baseline', default=BASELINE_PATH, help="statement counts (committed)")
+    parser.add_argument('--local-baseline', default=LOCAL_BASELINE_PATH, help="timings on this machine")
+    parser.add_argument('--save-baseline', action='store_true',
+                        help="store these results as the baselines instead of comparing")
+    parser.add_argument('--tolerance', type=float, default=0.25)
+    parser.add_argument('--min-delta', type=float, default=0.005)
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.repeat)
+        return
+
+    results = {scale: run_scale(scale, args.data_dir, args.repeat) for scale in args.scales}
+    baseline = load_baseline(args.baseline)
+    timings = load_baseline(args.local_baseline)
+
+    for scale, benchmarks in results.items():
+        print(f"{scale}:")
+        for name, result in benchmarks.items():
+            line = f"  {name:<34} {result['seconds'] * 1000:9.1f} ms {result['statements']:6d} statements"
+            noted = []
+            if name in timings.get(scale, {}):
+                noted.append(f"{timings[scale][name]['seconds'] * 1000:.1f} ms")
+            if name in baseline.get(scale, {}):
+                noted.append(str(baseline[scale][name]['statements']))
+            if noted:
+                line += f"   (baseline {', '.join(noted)})"
+            print(line)
+
+    if args.save_baseline:
+        save_baseline(args.baseline, baseline, results, ('statements',))
+        save_baseline(args.local_baseline, timings, results, ('seconds', 'statements'))
+        print(f"Statement counts saved to {args.baseline}, timings to {args.local_baseline}")
+        return
+
+    if not timings:
+        print("No timings recorded on this machine; run with --save-baseline to compare times too")
+    regressions = compare(results, baseline, timings, args.tolerance, args.min_delta)
+    for message in regressions:
+        print(f"REGRESSION {message}")
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
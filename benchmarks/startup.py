@@ -0,0 +1,90 @@
+# benchmarks/startup.py
+# Cold-start benchmark: time from launching a fresh interpreter to the login
+# dialog being visible, and to the first tab of the main window being painted
+# with its first page of data. Runs headless on Qt's offscreen platform.
+#
+#   python benchmarks/startup.py [--db school.db] [--runs 5]
+#
+# Exits non-zero if the median of either measurement misses its target.
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Targets in seconds, measured from process launch
+LOGIN_VISIBLE_TARGET = 0.5
+FIRST_TAB_TARGET = 1.5
+
+
+def child():
+    """Run one startup in this process and print the milestones as JSON"""
+    sys.path.insert(0, ROOT)
+    from PyQt5.QtWidgets import QApplication
+    from gui_login import LoginPage, prepare_database_in_background
+
+    app = QApplication(sys.argv[:1])
+    prepare_database_in_background()
+    login = LoginPage()
+    login.show()
+    app.processEvents()
+    login_visible = time.time()
+
+    # What gui_login does once the dialog is accepted
+    login.accept()
+    from gui_main import SchoolManagementSystem
+    window = SchoolManagementSystem()
+    window.show()
+    model = window.students_model
+    while model.loading or not (model.rows or model.exhausted):
+        app.processEvents()
+        time.sleep(0.001)
+    window.repaint()
+    app.processEvents()
+    first_tab = time.time()
+
+    window.close()
+    print(json.dumps({'login_visible': login_visible, 'first_tab': first_tab}))
+
+
+def measure(db_path):
+    env = dict(os.environ, QT_QPA_PLATFORM='offscreen')
+    if db_path:
+        env['SCHOOL_DB_PATH'] = os.path.abspath(db_path)
+    started = time.time()
+    output = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), '--child'],
+        env=env, check=True, capture_output=True, text=True
+    ).stdout
+    milestones = json.loads(output.strip().splitlines()[-1])
+    return milestones['login_visible'] - started, milestones['first_tab'] - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure GUI cold-start time")
+    parser.add_argument('--db', help="database file to open (default: from db_connection settings)")
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--login-target', type=float, default=LOGIN_VISIBLE_TARGET)
+    parser.add_argument('--first-tab-target', type=float, default=FIRST_TAB_TARGET)
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child()
+        return
+
+    results = [measure(args.db) for _ in range(args.runs)]
+    login = statistics.median(r[0] for r in results)
+    first_tab = statistics.median(r[1] for r in results)
+    print(f"login dialog visible: {login * 1000:7.0f} ms (target {args.login_target * 1000:.0f} ms)")
+    print(f"first tab painted:    {first_tab * 1000:7.0f} ms (target {args.first_tab_target * 1000:.0f} ms)")
+    if login > args.login_target or first_tab > args.first_tab_target:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
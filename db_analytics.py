@@ -0,0 +1,238 @@
+# db_analytics.py
+# Cohort and course reports computed in single set-based queries.
+#
+# GPAs come from the trigger-maintained GPA summary tables (see db_models),
+# and ranks, percentiles and shares are SQL window functions, so a report is
+# one query whatever the cohort size. Results are cached per (report,
+# semester, options) and dropped when a commit reports grade changes for
+# that semester (cumulative reports, semester None, are dropped on any grade
+# change), and all of them on student, course or enrollment changes. Bulk loads do not report changes, so callers
+# refresh with clear_cache() after them. Rankings come from the summaries and
+# so include archived terms; grade distributions and course statistics read
+# the grades of terms not yet archived (see db_archive).
+import math
+import threading
+
+from sqlalchemy import exists, func, select
+
+from db_models import (Course, Grade, Student, Term, enrollment, gpa_summary, semester_gpa_summary,
+                       add_change_listener, summary_gpa)
+
+# Share of the cohort, from the top, that makes the dean's list
+DEANS_LIST_FRACTION = 0.10
+
+
+class ReportCache:
+    """Report results keyed by (report, semester, options), invalidated by semester"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.results = {}
+        # Bumped by every invalidation; a result computed across one is not stored
+        self.generation = 0
+
+    def get(self, key):
+        with self.lock:
+            return self.results.get(key)
+
+    def put(self, key, value, generation):
+        with self.lock:
+            if generation == self.generation:
+                self.results[key] = value
+
+    def invalidate(self, semesters=None):
+        """Drop results for the given semesters and every cumulative result; None drops all"""
+        with self.lock:
+            self.generation += 1
+            if semesters is None:
+                self.results.clear()
+                return
+            self.results = {key: value for key, value in self.results.items()
+                            if key[1] is not None and key[1] not in semesters}
+
+    def changes_committed(self, changes):
+        if changes.keys() & {'courses', 'students', 'enrollment'}:
+            # Credit changes move GPAs in every semester; deleted students leave
+            # the cohort; enrollments are counted by course statistics
+            self.invalidate()
+        elif 'grades' in changes:
+            self.invalidate({semester for _, semester in changes.get('semester_gpa_summary', {}).get('updated', ())})
+
+cache = ReportCache()
+add_change_listener(cache.changes_committed)
+
+
+def clear_cache():
+    cache.invalidate()
+
+
+def cached(report):
+    """Serve report(session, semester=None, **options) from the cache"""
+    def run(session, semester=None, **options):
+        key = (report.__name__, semester, tuple(sorted(options.items())))
+        result = cache.get(key)
+        if result is None:
+            generation = cache.generation
+            result = report(session, semester, **options)
+            cache.put(key, result, generation)
+        return result
+    run.__name__ = report.__name__
+    run.__doc__ = report.__doc__
+    return run
+
+
+def _gpa_source(semester):
+    """The summary rows to rank: cumulative, or one semester's"""
+    if semester is None:
+        return select(gpa_summary).subquery()
+    return select(semester_gpa_summary).where(semester_gpa_summary.c.semester == semester).subquery()
+
+
+@cached
+def class_rank(session, semester=None):
+    """Every graded student ranked by GPA, best first.
+
+    Returns (rank, percentile, student number, name, GPA, credits) tuples;
+    tied GPAs share a rank, and percentile is the share of the cohort with
+    the same or a lower GPA.
+    """
+    summary = _gpa_source(semester)
+    gpa = summary_gpa(summary)
+    rank = func.rank().over(order_by=gpa.desc())
+    cohort = func.count().over()
+    query = select(
+        rank,
+        # Derived from the rank so the rows are sorted only once
+        func.round(100.0 * (cohort - rank + 1) / cohort, 1),
+        Student.student_number,
+        Student.first_name + ' ' + Student.last_name,
+        gpa,
+        summary.c.total_credits
+    ).join(Student, Student.id == summary.c.student_id).where(
+        summary.c.total_credits > 0
+    ).order_by(gpa.desc(), Student.student_number)
+    return [tuple(row) for row in session.execute(query)]
+
+
+@cached
+def deans_list(session, semester=None, fraction=DEANS_LIST_FRACTION):
+    """Students ranked within the top fraction of the cohort (at least the best one).
+
+    Returns (rank, percentile, student number, name, GPA, credits) tuples;
+    students tied with the last place all make the list.
+    """
+    ranked = class_rank(session, semester)
+    # The epsilon keeps e.g. 0.1 * 30 from flooring below 3
+    places = max(1, math.floor(fraction * len(ranked) + 1e-9))
+    return [row for row in ranked if row[0] <= places]
+
+
+@cached
+def grade_distribution(session, semester=None):
+    """Histogram of grade points per course.
+
+    Returns (course code, grade point, count, percent of the course's grades)
+    tuples, by course code and then best grade first.
+    """
+    count = func.count()
+    query = select(
+        Course.course_code,
+        Grade.grade_point,
+        count,
+        func.round(100.0 * count / func.sum(count).over(partition_by=Grade.course_id), 1)
+    ).join(Course, Course.id == Grade.course_id).group_by(
+        Grade.course_id, Grade.grade_point
+    ).order_by(Course.course_code, Grade.grade_point.desc())
+    if semester is not None:
+        query = query.where(Grade.semester == semester)
+    return [tuple(row) for row in session.execute(query)]
+
+
+@cached
+def course_statistics(session, semester=None):
+    """Per-course grade statistics, best mean first.
+
+    Returns (rank, course code, title, grades, mean, standard deviation,
+    lowest, highest, active enrollments) tuples.
+    """
+    mean = func.avg(Grade.grade_point)
+    grades = select(
+        Grade.course_id,
+        func.count().label('grades'),
+        mean.label('mean'),
+        # Population variance; SQLite has no sqrt without its math extension
+        (func.avg(Grade.grade_point * Grade.grade_point) - mean * mean).label('variance'),
+        func.min(Grade.grade_point).label('lowest'),
+        func.max(Grade.grade_point).label('highest')
+    ).group_by(Grade.course_id)
+    if semester is not None:
+        grades = grades.where(Grade.semester == semester)
+    grades = grades.subquery()
+    enrolled = select(
+        enrollment.c.course_id, func.count().label('enrolled')
+    ).where(enrollment.c.is_active == True).group_by(enrollment.c.course_id).subquery()
+
+    query = select(
+        func.rank().over(order_by=grades.c.mean.desc()),
+        Course.course_code,
+        Course.title,
+        grades.c.grades,
+        grades.c.mean,
+        grades.c.variance,
+        grades.c.lowest,
+        grades.c.highest,
+        func.coalesce(enrolled.c.enrolled, 0)
+    ).join(Course, Course.id == grades.c.course_id).outerjoin(
+        enrolled, enrolled.c.course_id == grades.c.course_id
+    ).order_by(grades.c.mean.desc(), Course.course_code)
+    return [
+        (rank, code, title, count, round(mean, 2), round(math.sqrt(max(variance, 0.0)), 2), lowest, highest, active)
+        for rank, code, title, count, mean, variance, lowest, highest, active in session.execute(query)
+    ]
+
+
+def semesters(session):
+    """Semesters that have grades, oldest first"""
+    return [semester for semester, in session.execute(
+        select(Term.name).where(
+            exists().where(semester_gpa_summary.c.semester == Term.name)
+        ).order_by(Term.id)
+    )]
+
+
+# Report name -> (function, column headers), as shown in the Reports tab
+REPORTS = {
+    "Class rank": (class_rank, ("Rank", "Percentile", "Student Number", "Name", "GPA", "Credits")),
+    "Dean's list": (deans_list, ("Rank", "Percentile", "Student Number", "Name", "GPA", "Credits")),
+    "Grade distribution": (grade_distribution, ("Code", "Grade Point", "Grades", "Percent")),
+    "Course statistics": (course_statistics, ("Rank", "Code", "Title", "Grades", "Mean", "Std Dev",
+                                              "Lowest", "Highest", "Enrolled")),
+}
+
+
+def report_slug(name):
+    """Command-line name of a report, e.g. "Dean's list" -> deans-list"""
+    return name.lower().replace(' ', '-').replace("'", '')
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="Print a cohort or course report")
+    parser.add_argument('report', choices=[report_slug(name) for name in REPORTS])
+    parser.add_argument('--semester', help="limit the report to one semester (default: all grades)")
+    parser.add_argument('--limit', type=int, default=20, help="rows to print (0 for all)")
+    args = parser.parse_args()
+
+    from db_models import open_session
+
+    name = next(name for name in REPORTS if report_slug(name) == args.report)
+    report, headers = REPORTS[name]
+    started = time.perf_counter()
+    rows = report(open_session(), args.semester)
+    elapsed = time.perf_counter() - started
+    print('\t'.join(headers))
+    for row in rows[:args.limit or None]:
+        print('\t'.join(str(value) for value in row))
+    print(f"{len(rows)} rows in {elapsed * 1000:.0f} ms")
@@ -0,0 +1,187 @@
+# db_archive.py
+# Closing terms and moving their grades and enrollments to the archive file.
+#
+# The archive is a second SQLite file attached to every connection as
+# `archive` (see db_connection), so the main file holds only the terms still
+# in use and day-to-day queries never read archived rows. Transcripts
+# (db_export) read both files, and GPAs need nothing extra: the GPA summaries
+# keep the totals of archived grades, and rebuilding or verifying them reads
+# the archive too (see db_models).
+#
+# A term is archived in two transactions, because SQLite does not commit
+# attached WAL databases atomically together: its rows are first copied to
+# the archive, then the rows present in the archive are deleted from the main
+# file. If either step is interrupted, archiving the term again finishes the
+# job without copying or deleting anything twice.
+#
+# Changing a course's credits updates the GPA summaries for its grades in the
+# main file only; after changing credits of a course with archived grades,
+# rebuild the summaries (python db_models.py --rebuild-gpa).
+from datetime import datetime
+
+from sqlalchemy import and_, func, literal, select, tuple_
+
+from db_connection import ARCHIVE_SCHEMA
+from db_models import (Term, Grade, enrollment, archive_metadata, archived_grades, archived_enrollment,
+                       archive_available, scaled_points)
+
+
+def find_term(session, name):
+    term = session.query(Term).filter(Term.name == name).one_or_none()
+    if term is None:
+        raise ValueError(f"No term named {name!r}")
+    return term
+
+
+def terms_overview(session):
+    """(term, grades in the main file, grades in the archive) for every term, oldest first"""
+    active = dict(session.execute(select(Grade.term_id, func.count()).group_by(Grade.term_id)).all())
+    archived = {}
+    if archive_available(session.connection()):
+        archived = dict(session.execute(
+            select(archived_grades.c.term_id, func.count()).group_by(archived_grades.c.term_id)
+        ).all())
+    return [(term, active.get(term.id, 0), archived.get(term.id, 0))
+            for term in session.query(Term).order_by(Term.id)]
+
+
+def close_term(session, name):
+    """Stop grades of a term from being added or changed"""
+    term = find_term(session, name)
+    term.is_closed = True
+    session.commit()
+    return term
+
+
+def reopen_term(session, name):
+    term = find_term(session, name)
+    if term.archived_at is not None:
+        raise ValueError(f"{name} has been archived and cannot be reopened")
+    term.is_closed = False
+    session.commit()
+    return term
+
+
+def create_archive(session):
+    """Create the archive tables if the archive file is new"""
+    if not archive_available(session.connection()):
+        archive_metadata.create_all(session.connection())
+        session.commit()
+
+
+def _finished_enrollments(term_id):
+    """Enrollments whose only grades are in the given term: the course was taken that term"""
+    # One pass over grades; probing grades per enrollment has no index on (student, course)
+    finished = select(Grade.student_id, Grade.course_id).group_by(
+        Grade.student_id, Grade.course_id
+    ).having(and_(func.min(Grade.term_id) == term_id, func.max(Grade.term_id) == term_id))
+    return tuple_(enrollment.c.student_id, enrollment.c.course_id).in_(finished)
+
+
+def archive_term(session, name):
+    """Move a closed term's grades, and the enrollments they finish, to the archive.
+
+    Returns (grades, enrollments) moved.
+    """
+    term = find_term(session, name)
+    if not term.is_closed:
+        raise ValueError(f"{name} must be closed before it is archived")
+    connection = session.connection()
+    if not connection.exec_driver_sql(
+        f"SELECT EXISTS (SELECT 1 FROM pragma_database_list WHERE name = '{ARCHIVE_SCHEMA}')"
+    ).scalar():
+        raise ValueError("No archive database is attached; set SCHOOL_DB_ARCHIVE")
+    create_archive(session)
+    term_id = term.id
+
+    # Copy; rows already copied by an interrupted run are kept as they are
+    grade_columns = [column.name for column in archived_grades.columns]
+    session.execute(archived_grades.insert().prefix_with('OR IGNORE').from_select(
+        grade_columns,
+        select(*[Grade.__table__.c[column] for column in grade_columns]).where(Grade.term_id == term_id)
+    ))
+    session.execute(archived_enrollment.insert().prefix_with('OR IGNORE').from_select(
+        ['student_id', 'course_id', 'enrollment_date', 'is_active', 'term_id'],
+        select(
+            enrollment.c.student_id, enrollment.c.course_id, enrollment.c.enrollment_date,
+            enrollment.c.is_active, literal(term_id)
+        ).where(_finished_enrollments(term_id))
+    ))
+    session.commit()
+
+    # Delete what is now in the archive. The GPA delete trigger subtracts each
+    # grade from the summaries, so the same totals are added back first: the
+    # summaries keep counting archived grades.
+    archived_ids = select(archived_grades.c.id).where(archived_grades.c.term_id == term_id)
+    moving = and_(Grade.term_id == term_id, Grade.id.in_(archived_ids))
+    connection = session.connection()
+    for summary, keys in (('gpa_summary', ('student_id',)), ('semester_gpa_summary', ('student_id', 'semester'))):
+        key_columns = ', '.join(f"grades.{key}" for key in keys)
+        connection.exec_driver_sql(
+            f"INSERT INTO {summary} ({', '.join(keys)}, weighted_sum, total_credits)"
+            f" SELECT {key_columns}, sum({scaled_points('grades.grade_point')} * courses.credits),"
+            f" sum(courses.credits)"
+            f" FROM grades JOIN courses ON courses.id = grades.course_id"
+            f" WHERE grades.term_id = ? AND grades.id IN"
+            f" (SELECT id FROM {ARCHIVE_SCHEMA}.grades WHERE term_id = ?)"
+            f" GROUP BY {key_columns}"
+            f" ON CONFLICT ({', '.join(keys)}) DO UPDATE SET"
+            f" weighted_sum = weighted_sum + excluded.weighted_sum,"
+            f" total_credits = total_credits + excluded.total_credits",
+            (term_id, term_id)
+        )
+    enrollments = session.execute(enrollment.delete().where(
+        tuple_(enrollment.c.student_id, enrollment.c.course_id).in_(
+            select(archived_enrollment.c.student_id, archived_enrollment.c.course_id)
+            .where(archived_enrollment.c.term_id == term_id)
+        )
+    )).rowcount
+    grades = session.execute(Grade.__table__.delete().where(moving)).rowcount
+    term.archived_at = term.archived_at or datetime.utcnow()
+    session.commit()
+    return grades, enrollments
+
+
+def vacuum(engine):
+    """Give the space freed by archiving back to the file system"""
+    with engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+        conn.exec_driver_sql("VACUUM main")
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="Close terms and archive their grades and enrollments")
+    parser.add_argument('command', choices=('list', 'close', 'reopen', 'archive'))
+    parser.add_argument('terms', nargs='*', help="term names, e.g. 'Fall 2023'")
+    parser.add_argument('--before', metavar='TERM', help="archive every closed term older than this one")
+    parser.add_argument('--vacuum', action='store_true', help="compact the main file after archiving")
+    args = parser.parse_args()
+
+    from db_models import engine, open_session
+
+    session = open_session()
+    if args.command == 'list':
+        for term, active, archived in terms_overview(session):
+            state = 'archived' if term.archived_at else 'closed' if term.is_closed else 'open'
+            print(f"{term.id}\t{term.name}\t{state}\t{active} grades\t{archived} archived")
+    elif args.command in ('close', 'reopen'):
+        for name in args.terms:
+            (close_term if args.command == 'close' else reopen_term)(session, name)
+            print(f"{name}: {'closed' if args.command == 'close' else 'reopened'}")
+    else:
+        names = list(args.terms)
+        if args.before:
+            cutoff = find_term(session, args.before).id
+            names += [term.name for term in session.query(Term).filter(
+                Term.id < cutoff, Term.is_closed == True, Term.archived_at.is_(None)).order_by(Term.id)]
+        for name in names:
+            started = time.perf_counter()
+            grades, enrollments = archive_term(session, name)
+            print(f"{name}: archived {grades} grades and {enrollments} enrollments "
+                  f"in {time.perf_counter() - started:.1f}s")
+        if args.vacuum:
+            session.close()
+            vacuum(engine)
+            print("Main database compacted")
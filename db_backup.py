@@ -0,0 +1,277 @@
+# db_backup.py
+# Online snapshots of the school database, with retention, verification and
+# restore.
+#
+# Snapshots are taken with SQLite's online backup API over a connection of
+# their own, BACKUP_STEP_PAGES pages at a time with a short pause between
+# steps, so other connections and processes keep reading and writing while
+# a snapshot is copied: in WAL mode a step never blocks writers, and in
+# rollback-journal mode it blocks them for one step only. A write by
+# another connection restarts the copy from the first page; after
+# BACKUP_RESTART_LIMIT restarts the rest is copied in one step, a single
+# read transaction, which in WAL mode still does not block writers.
+#
+# A snapshot is the file <name>-<timestamp>.db in the backup directory, plus
+# <name>-<timestamp>_archive.db when an archive database exists (see
+# db_archive). Every snapshot is checked with PRAGMA integrity_check before
+# it is kept, and older snapshots beyond the retention count are removed.
+#
+#   SCHOOL_DB_BACKUP_DIR      where snapshots go (default: backups/ beside the database)
+#   SCHOOL_DB_BACKUP_MINUTES  snapshot interval while the GUI runs (default: none)
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+from db_connection import archive_path_for, get_engine
+
+BACKUP_STEP_PAGES = 1024
+BACKUP_STEP_PAUSE_SECONDS = 0.005
+BACKUP_RESTART_LIMIT = 3
+SNAPSHOT_RETENTION = 7
+TIMESTAMP_FORMAT = '%Y%m%d-%H%M%S'
+
+
+class BackupError(Exception):
+    pass
+
+
+class _Restarted(Exception):
+    pass
+
+
+def database_paths(engine=None):
+    """(database file, archive file or None) of an engine, by default the application's"""
+    engine = engine or get_engine()
+    path = engine.url.database
+    if not path or path == ':memory:':
+        raise BackupError("Only file databases can be backed up")
+    archive = archive_path_for(engine.url)
+    if archive is not None and not os.path.exists(archive):
+        archive = None
+    return path, archive
+
+
+def backup_directory(path):
+    return os.environ.get('SCHOOL_DB_BACKUP_DIR') or os.path.join(os.path.dirname(os.path.abspath(path)), 'backups')
+
+
+def copy_database(source_path, target_path, step_pages=BACKUP_STEP_PAGES, pause=BACKUP_STEP_PAUSE_SECONDS,
+                  progress=None):
+    """Copy a live database file with the online backup API; returns the number of restarts.
+
+    progress, if given, is called with (pages copied, total pages) after each step.
+    """
+    source = sqlite3.connect(source_path)
+    target = sqlite3.connect(target_path)
+    restarts = 0
+    remaining_before = None
+
+    def step(status, remaining, total):
+        nonlocal restarts, remaining_before
+        if remaining_before is not None and remaining > remaining_before:
+            restarts += 1
+            if restarts > BACKUP_RESTART_LIMIT:
+                raise _Restarted()
+        remaining_before = remaining
+        if progress is not None:
+            progress(total - remaining, total)
+
+    try:
+        try:
+            source.backup(target, pages=step_pages, progress=step, sleep=pause)
+        except _Restarted:
+            source.backup(target, pages=-1)
+    finally:
+        target.close()
+        source.close()
+    return restarts
+
+
+def _make_standalone(path):
+    # The copy inherits WAL mode from the live file; a snapshot is a single file
+    connection = sqlite3.connect(path)
+    try:
+        connection.execute("PRAGMA journal_mode = DELETE")
+    finally:
+        connection.close()
+
+
+def verify_database(path, quick=False):
+    """Return the problems PRAGMA integrity_check (or quick_check) finds; empty means sound"""
+    connection = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        rows = connection.execute("PRAGMA quick_check" if quick else "PRAGMA integrity_check").fetchall()
+    finally:
+        connection.close()
+    problems = [row[0] for row in rows]
+    return [] if problems == ['ok'] else problems
+
+
+def _archive_companion(snapshot):
+    root, extension = os.path.splitext(snapshot)
+    return f"{root}_archive{extension}"
+
+
+def list_snapshots(directory, name='school'):
+    """Snapshot paths in directory, newest first"""
+    if not os.path.isdir(directory):
+        return []
+    snapshots = []
+    for entry in os.listdir(directory):
+        stem, extension = os.path.splitext(entry)
+        if extension != '.db' or not stem.startswith(name + '-') or stem.endswith('_archive'):
+            continue
+        try:
+            datetime.strptime(stem[len(name) + 1:], TIMESTAMP_FORMAT)
+        except ValueError:
+            continue
+        snapshots.append(os.path.join(directory, entry))
+    return sorted(snapshots, reverse=True)
+
+
+def prune_snapshots(directory, name='school', keep=SNAPSHOT_RETENTION):
+    """Delete all but the newest `keep` snapshots; returns the paths removed"""
+    removed = []
+    for snapshot in list_snapshots(directory, name)[keep:]:
+        for path in (snapshot, _archive_companion(snapshot)):
+            if os.path.exists(path):
+                os.remove(path)
+        removed.append(snapshot)
+    return removed
+
+
+def take_snapshot(directory=None, keep=SNAPSHOT_RETENTION, engine=None, progress=None):
+    """Copy the database (and archive) to a new verified snapshot and apply retention.
+
+    Returns the snapshot path. A snapshot that fails verification is deleted
+    and BackupError raised.
+    """
+    path, archive = database_paths(engine)
+    directory = directory or backup_directory(path)
+    os.makedirs(directory, exist_ok=True)
+    name = os.path.splitext(os.path.basename(path))[0]
+    snapshot = os.path.join(directory, f"{name}-{datetime.now().strftime(TIMESTAMP_FORMAT)}.db")
+    if os.path.exists(snapshot):
+        raise BackupError(f"{snapshot} already exists")
+
+    # Written under a temporary name, so a half-copied file is never listed
+    copies = [(path, snapshot)]
+    if archive is not None:
+        copies.append((archive, _archive_companion(snapshot)))
+    try:
+        for source, target in copies:
+            partial = target + '.partial'
+            copy_database(source, partial, progress=progress)
+            _make_standalone(partial)
+            problems = verify_database(partial)
+            if problems:
+                raise BackupError(f"Snapshot of {source} failed verification: {'; '.join(problems[:5])}")
+            os.replace(partial, target)
+    except BaseException:
+        for _, target in copies:
+            for leftover in (target, target + '.partial'):
+                if os.path.exists(leftover):
+                    os.remove(leftover)
+        raise
+    prune_snapshots(directory, name, keep)
+    return snapshot
+
+
+def restore_snapshot(snapshot, engine=None, progress=None):
+    """Replace the database (and archive) contents with a verified snapshot.
+
+    Other clients must be stopped first; this process's pooled connections
+    are closed so they reopen on the restored data.
+    """
+    engine = engine or get_engine()
+    path = engine.url.database
+    archive = archive_path_for(engine.url)
+    copies = [(snapshot, path)]
+    companion = _archive_companion(snapshot)
+    if archive is not None and os.path.exists(companion):
+        copies.append((companion, archive))
+    for source, _ in copies:
+        problems = verify_database(source)
+        if problems:
+            raise BackupError(f"{source} failed verification: {'; '.join(problems[:5])}")
+    engine.dispose()
+    for source, target in copies:
+        copy_database(source, target, progress=progress)
+
+
+class SnapshotScheduler(threading.Thread):
+    """Takes a snapshot every `interval` seconds on a daemon thread until stop()"""
+
+    def __init__(self, interval, directory=None, keep=SNAPSHOT_RETENTION, engine=None, on_snapshot=None,
+                 on_error=None):
+        super().__init__(name='snapshot-scheduler', daemon=True)
+        self.interval = interval
+        self.directory = directory
+        self.keep = keep
+        self.engine = engine
+        self.on_snapshot = on_snapshot
+        self.on_error = on_error
+        self.stopping = threading.Event()
+
+    def run(self):
+        while not self.stopping.wait(self.interval):
+            try:
+                snapshot = take_snapshot(self.directory, self.keep, self.engine)
+            except Exception as e:
+                if self.on_error is not None:
+                    self.on_error(e)
+            else:
+                if self.on_snapshot is not None:
+                    self.on_snapshot(snapshot)
+
+    def stop(self):
+        self.stopping.set()
+
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+
+    parser = argparse.ArgumentParser(description="Snapshot, verify and restore the school database")
+    parser.add_argument('command', choices=('snapshot', 'list', 'verify', 'restore', 'schedule'))
+    parser.add_argument('snapshot', nargs='?', help="snapshot file for verify and restore")
+    parser.add_argument('--dir', help="backup directory (default: SCHOOL_DB_BACKUP_DIR or backups/)")
+    parser.add_argument('--keep', type=int, default=SNAPSHOT_RETENTION, help="snapshots to retain")
+    parser.add_argument('--every', type=float, default=60, metavar='MINUTES', help="schedule interval")
+    args = parser.parse_args()
+
+    def report(copied, total):
+        print(f"\r{copied}/{total} pages", end='', file=sys.stderr)
+
+    path, _ = database_paths()
+    directory = args.dir or backup_directory(path)
+    if args.command == 'snapshot':
+        started = time.perf_counter()
+        snapshot = take_snapshot(directory, args.keep, progress=report)
+        print(f"\rSnapshot {snapshot} written and verified in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+    elif args.command == 'list':
+        for snapshot in list_snapshots(directory, os.path.splitext(os.path.basename(path))[0]):
+            print(f"{snapshot}\t{os.path.getsize(snapshot)} bytes")
+    elif args.command == 'verify':
+        problems = verify_database(args.snapshot or path)
+        for problem in problems:
+            print(problem)
+        print("ok" if not problems else f"{len(problems)} problems")
+        if problems:
+            raise SystemExit(1)
+    elif args.command == 'restore':
+        if not args.snapshot:
+            parser.error("restore needs a snapshot file")
+        restore_snapshot(args.snapshot, progress=report)
+        print(f"\rRestored {path} from {args.snapshot}", file=sys.stderr)
+    else:
+        scheduler = SnapshotScheduler(args.every * 60, directory, args.keep,
+                                      on_snapshot=lambda snapshot: print(f"Snapshot {snapshot}"),
+                                      on_error=lambda error: print(f"Snapshot failed: {error}", file=sys.stderr))
+        scheduler.start()
+        try:
+            scheduler.join()
+        except KeyboardInterrupt:
+            scheduler.stop()
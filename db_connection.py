@@ -0,0 +1,179 @@
+# db_connection.py
+# The one place that creates the SQLite engine.
+#
+# Settings come from, in order of precedence: environment variables, the
+# [database] and [pragmas] sections of an INI file (SCHOOL_DB_CONFIG, default
+# school.ini in the working directory), and the defaults below.
+#
+#   SCHOOL_DB_URL    full SQLAlchemy URL (overrides SCHOOL_DB_PATH)
+#   SCHOOL_DB_PATH   path of the SQLite file (default school.db)
+#   SCHOOL_DB_ECHO   1/true to log every statement (default off)
+#   SCHOOL_DB_SLOW_MS  log SELECTs slower than this with their query plan
+#                      (default 100); 0 or off disables query instrumentation
+#   SCHOOL_DB_ARCHIVE  path of the archive file attached as `archive` (default
+#                      the database path with _archive added; off to disable)
+#
+# Example school.ini:
+#
+#   [database]
+#   path = /srv/school/school.db
+#   echo = false
+#   slow_query_ms = 250
+#   archive = /srv/school/school_archive.db
+#
+#   [pragmas]
+#   cache_size = -131072
+import configparser
+import os
+import random
+import sqlite3
+
+from sqlalchemy import create_engine, event
+
+from db_instrument import SLOW_QUERY_SECONDS, instrument
+
+DEFAULT_PATH = 'school.db'
+
+# Schema name of the attached archive database (see db_archive)
+ARCHIVE_SCHEMA = 'archive'
+
+# Applied to every new connection. WAL lets readers run while a writer
+# commits; synchronous=NORMAL is durable in WAL mode except against power
+# loss on the last transactions; cache_size is negative KiB (64 MiB);
+# busy_timeout makes a locked database wait (ms) before raising SQLITE_BUSY.
+DEFAULT_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'foreign_keys': 'ON',
+    'busy_timeout': '5000',
+    'cache_size': '-65536',
+    'mmap_size': '268435456',
+    'temp_store': 'MEMORY',
+}
+
+# Retrying a transaction that failed with SQLITE_BUSY or SQLITE_LOCKED: the
+# first retry waits about BUSY_RETRY_SECONDS, doubling up to the maximum.
+# busy_timeout already waits for a lock; these errors still surface when it
+# expires, or at once when a read transaction cannot become a write one
+# because another connection committed first (SQLITE_BUSY_SNAPSHOT).
+BUSY_RETRIES = 5
+BUSY_RETRY_SECONDS = 0.05
+BUSY_RETRY_MAX_SECONDS = 1.0
+_SQLITE_BUSY = 5
+_SQLITE_LOCKED = 6
+
+_engine = None
+
+
+def _truthy(value):
+    return str(value).strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+def _read_config(config_path=None):
+    config = configparser.ConfigParser()
+    config.read(config_path or os.environ.get('SCHOOL_DB_CONFIG', 'school.ini'))
+    return config, config['database'] if config.has_section('database') else {}
+
+
+def load_settings(config_path=None):
+    """Return (url, echo, pragmas, slow_query_ms) from the environment, config file and defaults.
+
+    slow_query_ms is None when query instrumentation is turned off.
+    """
+    config, database = _read_config(config_path)
+
+    url = os.environ.get('SCHOOL_DB_URL') or database.get('url')
+    if not url:
+        path = os.environ.get('SCHOOL_DB_PATH') or database.get('path', DEFAULT_PATH)
+        url = f"sqlite:///{path}"
+    echo = _truthy(os.environ.get('SCHOOL_DB_ECHO', database.get('echo', 'false')))
+    slow_query_ms = os.environ.get('SCHOOL_DB_SLOW_MS', database.get('slow_query_ms', SLOW_QUERY_SECONDS * 1000))
+    if str(slow_query_ms).strip().lower() in ('0', 'off', 'false', 'no'):
+        slow_query_ms = None
+    else:
+        slow_query_ms = float(slow_query_ms)
+
+    pragmas = dict(DEFAULT_PRAGMAS)
+    if config.has_section('pragmas'):
+        pragmas.update(config['pragmas'])
+    return url, echo, pragmas, slow_query_ms
+
+
+def archive_path_for(url, config_path=None):
+    """Return the archive file for a database URL, or None if there is none"""
+    database = _read_config(config_path)[1]
+    configured = os.environ.get('SCHOOL_DB_ARCHIVE') or database.get('archive')
+    if configured:
+        return None if configured.strip().lower() in ('off', 'false', 'no', 'none') else configured
+    url = str(url)
+    if not url.startswith('sqlite:///') or url == 'sqlite:///' or ':memory:' in url:
+        return None
+    root, extension = os.path.splitext(url[len('sqlite:///'):])
+    return f"{root}_archive{extension or '.db'}"
+
+
+def apply_pragmas(engine, pragmas):
+    """Run the given PRAGMAs on every connection the engine opens"""
+    @event.listens_for(engine, 'connect')
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name} = {value}")
+        cursor.close()
+
+
+def attach_archive(engine, path, pragmas=DEFAULT_PRAGMAS):
+    """ATTACH the archive file to every connection the engine opens"""
+    @event.listens_for(engine, 'connect')
+    def attach(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            cursor.execute(f"ATTACH DATABASE ? AS {ARCHIVE_SCHEMA}", (path,))
+        except sqlite3.OperationalError:
+            # Missing directory or unreadable file: run without the archive
+            cursor.close()
+            return
+        for name in ('journal_mode', 'synchronous'):
+            cursor.execute(f"PRAGMA {ARCHIVE_SCHEMA}.{name} = {pragmas[name]}")
+        cursor.close()
+
+
+def is_busy_error(error):
+    """Whether an exception (SQLAlchemy or sqlite3) means the database was busy or locked"""
+    error = getattr(error, 'orig', error)
+    if not isinstance(error, sqlite3.OperationalError):
+        return False
+    code = getattr(error, 'sqlite_errorcode', None)
+    if code is not None:
+        return code & 0xff in (_SQLITE_BUSY, _SQLITE_LOCKED)
+    return 'locked' in str(error) or 'busy' in str(error)
+
+
+def busy_delay(attempt):
+    """Seconds to wait before retry number attempt (from 0), with jitter so writers spread out"""
+    return min(BUSY_RETRY_MAX_SECONDS, BUSY_RETRY_SECONDS * 2 ** attempt) * random.uniform(0.5, 1.0)
+
+
+def make_engine(url=None, echo=None, pragmas=None, config_path=None):
+    """Create a tuned, instrumented engine; arguments left as None come from load_settings"""
+    default_url, default_echo, default_pragmas, slow_query_ms = load_settings(config_path)
+    engine = create_engine(
+        url or default_url,
+        echo=default_echo if echo is None else echo
+    )
+    pragmas = default_pragmas if pragmas is None else pragmas
+    apply_pragmas(engine, pragmas)
+    archive = archive_path_for(engine.url, config_path)
+    if archive is not None:
+        attach_archive(engine, archive, {**DEFAULT_PRAGMAS, **pragmas})
+    if slow_query_ms is not None:
+        instrument(engine, slow_query_ms / 1000)
+    return engine
+
+
+def get_engine():
+    """Return the application's shared engine, creating it on first use"""
+    global _engine
+    if _engine is None:
+        _engine = make_engine()
+    return _engine
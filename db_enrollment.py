@@ -0,0 +1,128 @@
+# db_enrollment.py
+# Capacity-aware enrollment shared by the GUI and scripts.
+#
+# Each enrollment is a primary-key probe on the enrollment table followed by
+# one conditional INSERT ... SELECT that only produces a row if the student
+# and course exist and the course is below max_students. SQLite runs that
+# statement under the database write lock, so the capacity check and the
+# insert cannot interleave with another client's enrollment.
+import sys
+from datetime import datetime
+
+from sqlalchemy import exists, func, literal, or_, select
+
+from db_models import Student, Course, enrollment, record_change
+
+ENROLLED = 'enrolled'
+ALREADY_ENROLLED = 'already enrolled'
+COURSE_FULL = 'course full'
+NOT_FOUND = 'student or course not found'
+
+
+def is_enrolled(session, student_id, course_id):
+    """Primary-key probe for one enrollment row"""
+    return session.execute(
+        select(literal(1)).where(
+            enrollment.c.student_id == student_id,
+            enrollment.c.course_id == course_id
+        )
+    ).first() is not None
+
+
+def _conditional_insert(student_id, course_id, enrollment_date):
+    active_enrollments = select(func.count()).where(
+        enrollment.c.course_id == Course.id,
+        enrollment.c.is_active == True
+    ).scalar_subquery()
+    candidate = select(
+        literal(student_id), Course.id, literal(enrollment_date), literal(True)
+    ).where(
+        Course.id == course_id,
+        exists().where(Student.id == student_id),
+        or_(Course.max_students.is_(None), active_enrollments < Course.max_students)
+    )
+    return enrollment.insert().from_select(
+        ['student_id', 'course_id', 'enrollment_date', 'is_active'], candidate
+    ).prefix_with('OR IGNORE')
+
+
+def enroll(session, student_id, course_id):
+    """Enroll one student in one course; returns one of the result constants.
+
+    The caller owns the transaction and commits it.
+    """
+    if is_enrolled(session, student_id, course_id):
+        return ALREADY_ENROLLED
+    inserted = session.execute(_conditional_insert(student_id, course_id, datetime.utcnow())).rowcount
+    if inserted:
+        record_change(session, 'enrollment', 'inserted', (student_id, course_id))
+        return ENROLLED
+
+    # Nothing was inserted; work out why
+    if session.get(Student, student_id) is None or session.get(Course, course_id) is None:
+        return NOT_FOUND
+    if is_enrolled(session, student_id, course_id):
+        return ALREADY_ENROLLED
+    return COURSE_FULL
+
+
+def enroll_many(session, pairs):
+    """Enroll (student_id, course_id) pairs in the caller's transaction.
+
+    Returns a list of (student_id, course_id, result), one per pair, in order.
+    """
+    return [(student_id, course_id, enroll(session, student_id, course_id)) for student_id, course_id in pairs]
+
+
+def enroll_roster(session, course_id, student_ids):
+    """Enroll a list of students into one course section"""
+    return enroll_many(session, [(student_id, course_id) for student_id in student_ids])
+
+
+def enroll_in_courses(session, student_id, course_ids):
+    """Enroll one student into a list of courses"""
+    return enroll_many(session, [(student_id, course_id) for course_id in course_ids])
+
+
+def student_ids_by_number(session, student_numbers):
+    """Map student numbers to ids; unknown numbers are left out"""
+    return dict(session.query(Student.student_number, Student.id).filter(
+        Student.student_number.in_(student_numbers)
+    ))
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Enroll students into courses")
+    parser.add_argument('--course', action='append', required=True, metavar='CODE',
+                        help="course code; repeat to enroll into several courses")
+    parser.add_argument('student_numbers', nargs='*',
+                        help="student numbers (default: read one per line from stdin)")
+    args = parser.parse_args()
+
+    from db_models import open_session, run_unit_of_work
+
+    numbers = args.student_numbers or [line.strip() for line in sys.stdin if line.strip()]
+    session = open_session()
+    student_ids = student_ids_by_number(session, numbers)
+    course_ids = dict(session.query(Course.course_code, Course.id).filter(Course.course_code.in_(args.course)))
+    for code in args.course:
+        if code not in course_ids:
+            parser.error(f"unknown course code {code!r}")
+    for number in numbers:
+        if number not in student_ids:
+            print(f"{number}: unknown student number")
+
+    numbers_by_id = {student_id: number for number, student_id in student_ids.items()}
+    codes_by_id = {course_id: code for code, course_id in course_ids.items()}
+    session.close()
+    results = run_unit_of_work(enroll_many, [
+        (student_ids[number], course_ids[code])
+        for code in args.course for number in numbers if number in student_ids
+    ])
+
+    for student_id, course_id, result in results:
+        print(f"{numbers_by_id[student_id]} {codes_by_id[course_id]}: {result}")
+    enrolled = sum(result == ENROLLED for _, _, result in results)
+    print(f"{enrolled} of {len(results)} enrollments made")
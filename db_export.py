@@ -0,0 +1,198 @@
+# db_export.py
+# Streaming export of grades, student transcripts and course rosters to CSV
+# or JSONL.
+#
+# Each export is one column-only joined SELECT whose rows are pulled from
+# the cursor EXPORT_BATCH_SIZE at a time and written straight to the file,
+# so memory use does not grow with the number of rows. Every export is
+# ordered by an index (grades by id, transcripts by student through
+# ix_grades_student_semester, rosters by ix_enrollment_course), so SQLite
+# never has to sort the whole result before returning the first row. Column
+# names match db_import where they overlap, so a grades export can be
+# imported again.
+#
+# Grades and rosters cover the main database, that is the terms not yet
+# archived. Transcripts also read archived grades (see db_archive): the main
+# and archive rows are streamed side by side and merged in order.
+import csv
+import heapq
+import json
+import sys
+from datetime import datetime
+from itertools import islice
+
+from sqlalchemy import select
+
+from db_models import (Student, Course, Grade, enrollment, gpa_summary, semester_gpa_summary,
+                       archived_grades, archive_available, summary_gpa)
+
+KINDS = ('grades', 'transcripts', 'rosters')
+
+# Rows fetched from the cursor per round trip
+EXPORT_BATCH_SIZE = 5000
+
+
+def grades_query(grades):
+    return select(
+        Student.student_number,
+        Student.first_name,
+        Student.last_name,
+        Course.course_code,
+        grades.c.semester,
+        grades.c.grade_point,
+        grades.c.created_at
+    ).select_from(grades).join(
+        Student, Student.id == grades.c.student_id
+    ).join(
+        Course, Course.id == grades.c.course_id
+    ).order_by(grades.c.id)
+
+
+def transcripts_query(grades):
+    """Transcript lines of grades (the main or the archive table), in term order per student"""
+    return select(
+        Student.student_number,
+        Student.first_name,
+        Student.last_name,
+        grades.c.semester,
+        Course.course_code,
+        Course.title,
+        Course.credits,
+        grades.c.grade_point,
+        summary_gpa(semester_gpa_summary).label('semester_gpa'),
+        summary_gpa(gpa_summary).label('cgpa')
+    ).select_from(grades).join(
+        Student, Student.id == grades.c.student_id
+    ).join(
+        Course, Course.id == grades.c.course_id
+    ).outerjoin(
+        semester_gpa_summary, (semester_gpa_summary.c.student_id == grades.c.student_id)
+        & (semester_gpa_summary.c.semester == grades.c.semester)
+    ).outerjoin(
+        gpa_summary, gpa_summary.c.student_id == grades.c.student_id
+    ).order_by(*_transcript_order(grades))
+
+
+def _transcript_order(grades):
+    return grades.c.student_id, grades.c.term_id, grades.c.id
+
+
+def rosters_query(grades):
+    return select(
+        Course.course_code,
+        Course.title,
+        Student.student_number,
+        Student.first_name,
+        Student.last_name,
+        Student.email,
+        enrollment.c.enrollment_date,
+        enrollment.c.is_active
+    ).select_from(enrollment).join(
+        Course, Course.id == enrollment.c.course_id
+    ).join(
+        Student, Student.id == enrollment.c.student_id
+    ).order_by(enrollment.c.course_id, enrollment.c.student_id)
+
+
+def export_query(kind, semester=None, course_code=None, student_number=None, grades=None):
+    """Build the export SELECT for a kind, with optional filters.
+
+    grades is the grades table to read, by default the main one.
+    """
+    if kind not in KINDS:
+        raise ValueError(f"Unknown export kind {kind!r}; expected one of {', '.join(KINDS)}")
+    grades = Grade.__table__ if grades is None else grades
+    query = {'grades': grades_query, 'transcripts': transcripts_query, 'rosters': rosters_query}[kind](grades)
+    if semester is not None:
+        if kind == 'rosters':
+            raise ValueError("Rosters cannot be filtered by semester")
+        query = query.where(grades.c.semester == semester)
+    if course_code is not None:
+        query = query.where(Course.course_code == course_code)
+    if student_number is not None:
+        query = query.where(Student.student_number == student_number)
+    return query
+
+
+def _value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def export_rows(session, kind, out, fmt='csv', batch_size=EXPORT_BATCH_SIZE, progress=None, **filters):
+    """Stream an export of the given kind to the text file object out.
+
+    filters are semester, course_code and student_number. progress, if
+    given, is called with the running row count after every batch. Returns
+    the number of rows written.
+    """
+    options = {'yield_per': batch_size, 'stream_results': True}
+    if kind == 'transcripts' and archive_available(session.connection()):
+        columns, batches = _merged_transcripts(session, options, filters)
+    else:
+        result = session.execute(export_query(kind, **filters), execution_options=options)
+        columns, batches = list(result.keys()), result.partitions()
+    if fmt == 'csv':
+        writer = csv.writer(out)
+        writer.writerow(columns)
+        write = lambda row: writer.writerow([_value(value) for value in row])
+    else:
+        write = lambda row: out.write(json.dumps(dict(zip(columns, map(_value, row)))) + '\n')
+
+    count = 0
+    for batch in batches:
+        for row in batch:
+            write(row)
+        count += len(batch)
+        if progress is not None:
+            progress(count)
+    return count
+
+
+def _merged_transcripts(session, options, filters):
+    """Stream main and archived transcript lines as one ordered sequence; returns (columns, batches)"""
+    results = []
+    for grades in (Grade.__table__, archived_grades):
+        order = _transcript_order(grades)
+        query = export_query('transcripts', grades=grades, **filters).add_columns(*order)
+        results.append(session.execute(query, execution_options=options))
+    keys = len(order)
+    rows = (row[:-keys] for row in heapq.merge(*results, key=lambda row: tuple(row[-keys:])))
+    batches = iter(lambda: list(islice(rows, options['yield_per'])), [])
+    return list(results[0].keys())[:-keys], batches
+
+
+def export_file(session, kind, path, fmt=None, batch_size=EXPORT_BATCH_SIZE, progress=None, **filters):
+    """Export to a CSV or JSONL file ('-' for stdout); see export_rows"""
+    fmt = fmt or ('jsonl' if path.endswith(('.jsonl', '.json')) else 'csv')
+    if path == '-':
+        return export_rows(session, kind, sys.stdout, fmt, batch_size, progress, **filters)
+    with open(path, 'w', newline='', encoding='utf-8') as out:
+        return export_rows(session, kind, out, fmt, batch_size, progress, **filters)
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="Export records from the school database")
+    parser.add_argument('kind', choices=KINDS)
+    parser.add_argument('path', help="output .csv or .jsonl file, or - for stdout")
+    parser.add_argument('--format', choices=('csv', 'jsonl'), help="file format (default: from the extension)")
+    parser.add_argument('--semester')
+    parser.add_argument('--course', dest='course_code', metavar='CODE')
+    parser.add_argument('--student', dest='student_number', metavar='NUMBER')
+    parser.add_argument('--batch-size', type=int, default=EXPORT_BATCH_SIZE)
+    args = parser.parse_args()
+
+    from db_models import open_session
+
+    started = time.perf_counter()
+    def report(count):
+        print(f"\r{count} rows", end='', file=sys.stderr)
+
+    count = export_file(open_session(), args.kind, args.path, args.format, args.batch_size,
+                        report if args.path != '-' else None,
+                        semester=args.semester, course_code=args.course_code, student_number=args.student_number)
+    print(f"\r{count} rows exported in {time.perf_counter() - started:.1f}s", file=sys.stderr)
@@ -0,0 +1,291 @@
+# db_import.py
+# Bulk import of students, courses, enrollments and grades from CSV or JSONL.
+#
+# Files are streamed row by row, validated, and written with executemany
+# inserts in large chunks, one transaction per chunk. Student numbers and
+# course codes are resolved to ids through in-memory maps loaded once per
+# import. Rows that fail validation are written to an optional reject file
+# (JSONL, one {"line", "error", "row"} object per rejected row) instead of
+# aborting the import.
+import csv
+import json
+import os
+import sys
+from datetime import datetime
+
+from db_models import Student, Course, Grade, enrollment, is_term_closed
+
+KINDS = ('students', 'courses', 'enrollments', 'grades')
+
+# Rows written per executemany/transaction
+IMPORT_CHUNK_SIZE = 5000
+
+
+class ImportResult:
+    def __init__(self, kind):
+        self.kind = kind
+        self.imported = 0
+        self.rejected = 0
+
+    def __repr__(self):
+        return f"<ImportResult {self.kind}: {self.imported} imported, {self.rejected} rejected>"
+
+
+class UnreadableRow:
+    """A JSONL line that is not a JSON object; importing it rejects it"""
+
+    def __init__(self, text, error):
+        self.text = text
+        self.error = error
+
+
+def read_rows(path, fmt=None):
+    """Yield (line number, dict or UnreadableRow) pairs from a CSV or JSONL file"""
+    fmt = fmt or ('jsonl' if path.endswith(('.jsonl', '.json')) else 'csv')
+    # utf-8-sig drops the byte-order mark spreadsheets put before the header
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        if fmt == 'csv':
+            # Line 1 is the header
+            for line, row in enumerate(csv.DictReader(f), start=2):
+                yield line, row
+        else:
+            for line, text in enumerate(f, start=1):
+                if not text.strip():
+                    continue
+                try:
+                    row = json.loads(text)
+                except ValueError as e:
+                    yield line, UnreadableRow(text.rstrip('\r\n'), f"invalid JSON: {e}")
+                    continue
+                if isinstance(row, dict):
+                    yield line, row
+                else:
+                    yield line, UnreadableRow(text.rstrip('\r\n'), "not a JSON object")
+
+
+# Field parsers; each raises ValueError with a message fit for the reject file
+def _text(row, field, required=True):
+    value = row.get(field)
+    value = '' if value is None else str(value).strip()
+    if required and not value:
+        raise ValueError(f"missing {field}")
+    return value or None
+
+def _int(row, field, required=True):
+    value = _text(row, field, required)
+    if value is None:
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        raise ValueError(f"{field} is not an integer: {value!r}")
+
+def _float(row, field):
+    value = _text(row, field)
+    try:
+        return float(value)
+    except ValueError:
+        raise ValueError(f"{field} is not a number: {value!r}")
+
+def _datetime(row, field):
+    value = _text(row, field, required=False)
+    if value is None:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f"{field} is not an ISO date: {value!r}")
+
+def _bool(row, field, default):
+    value = _text(row, field, required=False)
+    if value is None:
+        return default
+    if value.lower() in ('1', 'true', 'yes', 'y'):
+        return True
+    if value.lower() in ('0', 'false', 'no', 'n'):
+        return False
+    raise ValueError(f"{field} is not a boolean: {value!r}")
+
+
+class Importer:
+    """Validates rows of one kind and turns them into insert parameters.
+
+    The lookup maps and uniqueness sets are loaded with one query each when
+    the importer is created and extended as rows are accepted, so duplicates
+    inside the file are caught as well as clashes with existing data.
+    """
+
+    def __init__(self, session, kind):
+        self.kind = kind
+        self.table = {
+            'students': Student.__table__,
+            'courses': Course.__table__,
+            'enrollments': enrollment,
+            'grades': Grade.__table__,
+        }[kind]
+
+        if kind == 'students':
+            existing = session.query(Student.student_number, Student.email).all()
+            self.student_numbers = {number for number, _ in existing}
+            self.emails = {email for _, email in existing}
+        if kind == 'courses':
+            self.course_codes = {code for code, in session.query(Course.course_code)}
+        if kind in ('enrollments', 'grades'):
+            self.student_ids = dict(session.query(Student.student_number, Student.id))
+            self.course_ids = dict(session.query(Course.course_code, Course.id))
+        if kind == 'grades':
+            # Semester name -> closed, checked once per name
+            self.session = session
+            self.closed = {}
+        if kind == 'enrollments':
+            self.enrolled = set(session.query(enrollment.c.student_id, enrollment.c.course_id))
+
+    def resolve(self, row):
+        student_number = _text(row, 'student_number')
+        course_code = _text(row, 'course_code')
+        if student_number not in self.student_ids:
+            raise ValueError(f"unknown student_number {student_number!r}")
+        if course_code not in self.course_ids:
+            raise ValueError(f"unknown course_code {course_code!r}")
+        return self.student_ids[student_number], self.course_ids[course_code]
+
+    def parse(self, row):
+        """Return insert parameters for row, or raise ValueError"""
+        if isinstance(row, UnreadableRow):
+            raise ValueError(row.error)
+        return getattr(self, f'parse_{self.kind}')(row)
+
+    def parse_students(self, row):
+        values = {
+            'student_number': _text(row, 'student_number'),
+            'first_name': _text(row, 'first_name'),
+            'last_name': _text(row, 'last_name'),
+            'email': _text(row, 'email'),
+            'date_of_birth': _datetime(row, 'date_of_birth'),
+        }
+        if values['student_number'] in self.student_numbers:
+            raise ValueError(f"duplicate student_number {values['student_number']!r}")
+        if values['email'] in self.emails:
+            raise ValueError(f"duplicate email {values['email']!r}")
+        self.student_numbers.add(values['student_number'])
+        self.emails.add(values['email'])
+        return values
+
+    def parse_courses(self, row):
+        values = {
+            'course_code': _text(row, 'course_code'),
+            'title': _text(row, 'title'),
+            'description': _text(row, 'description', required=False),
+            'credits': _int(row, 'credits'),
+            'max_students': _int(row, 'max_students', required=False),
+            'is_active': _bool(row, 'is_active', True),
+        }
+        if values['course_code'] in self.course_codes:
+            raise ValueError(f"duplicate course_code {values['course_code']!r}")
+        if values['credits'] <= 0:
+            raise ValueError("credits must be positive")
+        self.course_codes.add(values['course_code'])
+        return values
+
+    def parse_enrollments(self, row):
+        student_id, course_id = self.resolve(row)
+        if (student_id, course_id) in self.enrolled:
+            raise ValueError("student already enrolled in this course")
+        self.enrolled.add((student_id, course_id))
+        return {
+            'student_id': student_id,
+            'course_id': course_id,
+            'enrollment_date': _datetime(row, 'enrollment_date') or datetime.utcnow(),
+            'is_active': True,
+        }
+
+    def parse_grades(self, row):
+        student_id, course_id = self.resolve(row)
+        grade_point = _float(row, 'grade_point')
+        if not 0.0 <= grade_point <= 4.0:
+            raise ValueError(f"grade_point out of range: {grade_point}")
+        semester = _text(row, 'semester')
+        if semester not in self.closed:
+            self.closed[semester] = is_term_closed(self.session.connection(), semester)
+        if self.closed[semester]:
+            raise ValueError(f"term {semester!r} is closed")
+        return {
+            'student_id': student_id,
+            'course_id': course_id,
+            'semester': semester,
+            'grade_point': grade_point,
+        }
+
+
+def import_rows(session, kind, rows, rejects=None, chunk_size=IMPORT_CHUNK_SIZE, progress=None):
+    """Import (line number, dict) pairs of the given kind.
+
+    Accepted rows are inserted chunk_size at a time with one executemany per
+    chunk, committing after each. Rejected rows are written to the rejects
+    file object, if given, as JSON lines. progress, if given, is called with
+    the ImportResult after every chunk.
+    """
+    if kind not in KINDS:
+        raise ValueError(f"Unknown import kind {kind!r}; expected one of {', '.join(KINDS)}")
+    importer = Importer(session, kind)
+    result = ImportResult(kind)
+    chunk = []
+
+    def flush():
+        session.execute(importer.table.insert(), chunk)
+        session.commit()
+        result.imported += len(chunk)
+        chunk.clear()
+        if progress is not None:
+            progress(result)
+
+    for line, row in rows:
+        try:
+            chunk.append(importer.parse(row))
+        except ValueError as e:
+            result.rejected += 1
+            if rejects is not None:
+                if isinstance(row, UnreadableRow):
+                    row = row.text
+                rejects.write(json.dumps({'line': line, 'error': str(e), 'row': row}, default=str) + '\n')
+            continue
+        if len(chunk) >= chunk_size:
+            flush()
+    if chunk:
+        flush()
+    return result
+
+
+def import_file(session, kind, path, reject_path=None, fmt=None, chunk_size=IMPORT_CHUNK_SIZE, progress=None):
+    """Import a CSV or JSONL file of the given kind; see import_rows"""
+    rejects = open(reject_path, 'w', encoding='utf-8') if reject_path else None
+    try:
+        return import_rows(session, kind, read_rows(path, fmt), rejects, chunk_size, progress)
+    finally:
+        if rejects is not None:
+            rejects.close()
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="Bulk import records into the school database")
+    parser.add_argument('kind', choices=KINDS)
+    parser.add_argument('path', help="CSV file with a header row, or JSONL file")
+    parser.add_argument('--format', choices=('csv', 'jsonl'), help="file format (default: from the extension)")
+    parser.add_argument('--rejects', help="write rejected rows to this JSONL file")
+    parser.add_argument('--chunk-size', type=int, default=IMPORT_CHUNK_SIZE)
+    args = parser.parse_args()
+
+    from db_models import open_session
+
+    started = time.perf_counter()
+    def report(result):
+        print(f"\r{result.imported} imported, {result.rejected} rejected", end='', file=sys.stderr)
+
+    result = import_file(open_session(), args.kind, args.path, args.rejects, args.format, args.chunk_size, report)
+    print(f"\r{result.imported} imported, {result.rejected} rejected "
+          f"in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+    if result.rejected and args.rejects:
+        print(f"Rejected rows written to {os.path.abspath(args.rejects)}", file=sys.stderr)
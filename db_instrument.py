@@ -0,0 +1,148 @@
+# db_instrument.py
+# Lightweight query instrumentation, cheap enough to leave on.
+#
+# Statements are attributed to the action running on the current thread
+# (see track_action); the GUI's task runner wraps every task in one. For
+# each action we keep the statement count, the time spent in the database
+# and how often each distinct statement text ran. A statement text repeated
+# N_PLUS_ONE_THRESHOLD or more times within one action is reported as a
+# likely N+1 pattern (one query per row instead of one for all rows).
+# Statements slower than the slow-query threshold are logged with their
+# EXPLAIN QUERY PLAN whether or not an action is running.
+#
+# Per statement the cost is two perf_counter() calls and a dict update.
+import logging
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+
+from sqlalchemy import event
+
+logger = logging.getLogger('school.db')
+
+SLOW_QUERY_SECONDS = 0.1
+N_PLUS_ONE_THRESHOLD = 10
+RECENT_ACTIONS = 200
+
+_local = threading.local()
+_listeners = []
+_listeners_lock = threading.Lock()
+
+# Summaries of the most recently finished actions, newest last
+recent_actions = deque(maxlen=RECENT_ACTIONS)
+
+
+class ActionStats:
+    """Statements and database time attributed to one action"""
+
+    def __init__(self, name):
+        self.name = name
+        self.started = time.perf_counter()
+        self.elapsed = 0.0
+        self.statements = 0
+        self.db_time = 0.0
+        self.shapes = Counter()
+        self.slow_queries = []
+        self.failed = False
+
+    @property
+    def repeated(self):
+        """(statement, count) pairs that look like N+1 patterns"""
+        return [(statement, count) for statement, count in self.shapes.items()
+                if count >= N_PLUS_ONE_THRESHOLD]
+
+    def summary(self):
+        text = (f"{self.name}: {self.statements} queries, {self.db_time * 1000:.1f} ms in database, "
+                f"{self.elapsed * 1000:.1f} ms total")
+        if self.failed:
+            text += ", failed"
+        if self.repeated:
+            text += f", {len(self.repeated)} possible N+1"
+        if self.slow_queries:
+            text += f", {len(self.slow_queries)} slow"
+        return text
+
+    def __repr__(self):
+        return f"<ActionStats {self.summary()}>"
+
+
+def add_action_listener(callback):
+    """Call callback(stats) with an ActionStats as each action finishes, on that action's thread"""
+    with _listeners_lock:
+        _listeners.append(callback)
+
+def remove_action_listener(callback):
+    with _listeners_lock:
+        if callback in _listeners:
+            _listeners.remove(callback)
+
+
+def current_action():
+    return getattr(_local, 'action', None)
+
+
+@contextmanager
+def track_action(name):
+    """Attribute the statements run on this thread inside the block to an action"""
+    stats = ActionStats(name)
+    outer = current_action()
+    _local.action = stats
+    try:
+        yield stats
+    except Exception:
+        stats.failed = True
+        raise
+    finally:
+        _local.action = outer
+        stats.elapsed = time.perf_counter() - stats.started
+        _finish(stats)
+
+
+def _finish(stats):
+    recent_actions.append(stats)
+    for statement, count in stats.repeated:
+        logger.warning("Possible N+1 in %s: statement ran %d times: %s", stats.name, count, _short(statement))
+    logger.debug(stats.summary())
+    with _listeners_lock:
+        listeners = list(_listeners)
+    for callback in listeners:
+        callback(stats)
+
+
+def _short(statement, limit=200):
+    statement = ' '.join(statement.split())
+    return statement if len(statement) <= limit else statement[:limit] + '...'
+
+
+def _plan(cursor, statement, parameters):
+    try:
+        plan = cursor.connection.execute(f"EXPLAIN QUERY PLAN {statement}", parameters or ()).fetchall()
+    except Exception as e:
+        return f"(no plan: {e})"
+    return '; '.join(str(row[-1]) for row in plan)
+
+
+def instrument(engine, slow_query_seconds=SLOW_QUERY_SECONDS):
+    """Install the timing hooks on an engine"""
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def before_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info['query_started'] = time.perf_counter()
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def after_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info['query_started']
+        stats = current_action()
+        if stats is not None:
+            stats.statements += 1
+            stats.db_time += elapsed
+            # executemany batches are one statement per chunk by design
+            if not executemany:
+                stats.shapes[statement] += 1
+        if elapsed >= slow_query_seconds and not executemany and statement.lstrip()[:6].upper() == 'SELECT':
+            plan = _plan(cursor, statement, parameters)
+            if stats is not None:
+                stats.slow_queries.append((statement, elapsed, plan))
+            logger.warning("Slow query (%.0f ms%s): %s -- plan: %s", elapsed * 1000,
+                           f" in {stats.name}" if stats is not None else "", _short(statement), plan)
@@ -0,0 +1,163 @@
+# db_lookup.py
+# Shared in-process cache of student and course display data.
+#
+# Tables that list facts (enrollments, grades) select only the student and
+# course ids and take names and codes from here, so each student or course
+# row is read once per process rather than once per page per tab. A cache
+# is filled with one query the first time it is used, if the table fits in
+# its memory bound; otherwise, and after invalidation, missing ids are
+# fetched in one query per batch. Entries are compact __slots__ records,
+# evicted least recently used beyond max_entries.
+#
+# Staleness is handled two ways: commits in this process report the rows
+# they changed (see db_models change listeners), which are dropped at once;
+# changes from other processes are caught by the table_versions stamp,
+# checked at most every VERSION_CHECK_SECONDS, which clears the cache.
+import threading
+import time
+from collections import OrderedDict
+
+from sqlalchemy import func, select
+
+from db_models import Student, Course, table_versions, add_change_listener
+
+VERSION_CHECK_SECONDS = 2.0
+
+# Memory bounds, in records (a student record is roughly 300 bytes)
+STUDENT_CACHE_SIZE = 100000
+COURSE_CACHE_SIZE = 10000
+
+# Ids per IN (...) query; SQLite caps bound parameters per statement
+FETCH_CHUNK_SIZE = 500
+
+
+class StudentInfo:
+    __slots__ = ('id', 'student_number', 'first_name', 'last_name', 'email')
+
+    def __init__(self, id, student_number, first_name, last_name, email):
+        self.id = id
+        self.student_number = student_number
+        self.first_name = first_name
+        self.last_name = last_name
+        self.email = email
+
+    @property
+    def name(self):
+        return f"{self.first_name} {self.last_name}"
+
+
+class CourseInfo:
+    __slots__ = ('id', 'course_code', 'title', 'credits')
+
+    def __init__(self, id, course_code, title, credits):
+        self.id = id
+        self.course_code = course_code
+        self.title = title
+        self.credits = credits
+
+
+class LookupCache:
+    """id -> record cache for one table; safe to share between threads"""
+
+    def __init__(self, table, record, columns, max_entries):
+        self.table = table
+        self.record = record
+        self.columns = columns
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.records = OrderedDict()
+        self.loaded = False
+        self.version = None
+        self.version_checked = 0.0
+        self.hits = 0
+        self.misses = 0
+
+    def check_version(self, session):
+        """Clear the cache if another connection changed the table"""
+        now = time.monotonic()
+        if now - self.version_checked < VERSION_CHECK_SECONDS:
+            return
+        version = session.execute(
+            select(table_versions.c.version).where(table_versions.c.name == self.table)
+        ).scalar()
+        with self.lock:
+            if self.version is not None and version != self.version:
+                self.records.clear()
+            self.version = version
+            self.version_checked = now
+
+    def get_many(self, session, ids):
+        """Return {id: record} for the given ids, reading only the missing ones.
+
+        Ids with no row (deleted since) are left out.
+        """
+        self.check_version(session)
+        if not self.loaded:
+            self.load_all(session)
+        ids = set(ids)
+        found = {}
+        with self.lock:
+            for record_id in ids:
+                record = self.records.get(record_id)
+                if record is not None:
+                    self.records.move_to_end(record_id)
+                    found[record_id] = record
+            self.hits += len(found)
+            self.misses += len(ids) - len(found)
+        missing = [record_id for record_id in ids if record_id not in found]
+        for start in range(0, len(missing), FETCH_CHUNK_SIZE):
+            chunk = missing[start:start + FETCH_CHUNK_SIZE]
+            records = [self.record(*row) for row in session.execute(
+                select(*self.columns).where(self.columns[0].in_(chunk))
+            )]
+            self.store(records)
+            found.update((record.id, record) for record in records)
+        return found
+
+    def load_all(self, session):
+        """Fill the cache with one query if the whole table fits"""
+        self.loaded = True
+        count = session.execute(select(func.count()).select_from(self.columns[0].table)).scalar()
+        if count <= self.max_entries:
+            self.store([self.record(*row) for row in session.execute(select(*self.columns))])
+
+    def store(self, records):
+        with self.lock:
+            for record in records:
+                self.records[record.id] = record
+            while len(self.records) > self.max_entries:
+                self.records.popitem(last=False)
+
+    def discard(self, ids):
+        with self.lock:
+            for record_id in ids:
+                self.records.pop(record_id, None)
+
+    def clear(self):
+        with self.lock:
+            self.records.clear()
+            self.loaded = False
+            self.version = None
+
+    def __len__(self):
+        return len(self.records)
+
+
+students = LookupCache(
+    'students', StudentInfo,
+    (Student.id, Student.student_number, Student.first_name, Student.last_name, Student.email),
+    STUDENT_CACHE_SIZE
+)
+courses = LookupCache(
+    'courses', CourseInfo,
+    (Course.id, Course.course_code, Course.title, Course.credits),
+    COURSE_CACHE_SIZE
+)
+
+
+def _changes_committed(changes):
+    for table, cache in (('students', students), ('courses', courses)):
+        kinds = changes.get(table, {})
+        cache.discard(key[0] for kind in ('updated', 'deleted') for key in kinds.get(kind, ()))
+
+add_change_listener(_changes_committed)
@@ -1,7 +1,14 @@
-from sqlalchemy import create_engine, Column, Integer, String, ForeignKey, Table, DateTime, Boolean, Float, func
+from sqlalchemy import (Column, Integer, String, ForeignKey, Table, DateTime, Boolean, Float, Index, MetaData,
+                        case, event, func, inspect, select, union_all)
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import relationship, sessionmaker
+from sqlalchemy.orm import attributes, relationship, sessionmaker, Session as SessionBase
+from sqlalchemy.orm.exc import StaleDataError
 from datetime import datetime
+import itertools
+import threading
+import time
+
+from db_connection import ARCHIVE_SCHEMA, BUSY_RETRIES, busy_delay, get_engine, is_busy_error
 
 Base = declarative_base()
 
@@ -12,11 +19,32 @@ enrollment = Table(
     Column('student_id', Integer, ForeignKey('students.id'), primary_key=True),
     Column('course_id', Integer, ForeignKey('courses.id'), primary_key=True),
     Column('enrollment_date', DateTime, default=datetime.utcnow),
-    Column('is_active', Boolean, default=True)
+    Column('is_active', Boolean, default=True),
+    Index('ix_enrollment_course', 'course_id', 'student_id')
 )
 
+class Term(Base):
+    __tablename__ = 'terms'
+    
+    # year * 10 + season (winter 1 ... fall 4), so ids sort chronologically;
+    # names in any other format get ids after every dated term
+    id = Column(Integer, primary_key=True)
+    name = Column(String(20), unique=True, nullable=False)  # e.g., "Fall 2024"
+    is_closed = Column(Boolean, nullable=False, default=False)
+    archived_at = Column(DateTime)
+    
+    grades = relationship('Grade', back_populates='term')
+    
+    def __repr__(self):
+        return f"<Term {self.id}: {self.name}>"
+
 class Grade(Base):
     __tablename__ = 'grades'
+    __table_args__ = (
+        Index('ix_grades_student_semester', 'student_id', 'semester'),
+        Index('ix_grades_course', 'course_id'),
+        Index('ix_grades_term', 'term_id'),
+    )
     
     id = Column(Integer, primary_key=True)
     student_id = Column(Integer, ForeignKey('students.id'), nullable=False)
@@ -24,10 +52,15 @@ class Grade(Base):
     semester = Column(String(20), nullable=False)  # e.g., "Fall 2024"
     grade_point = Column(Float, nullable=False)  # e.g., 4.0, 3.7, etc.
     created_at = Column(DateTime, default=datetime.utcnow)
+    term_id = Column(Integer, ForeignKey('terms.id'))  # set from semester by trigger
+    version_id = Column(Integer, nullable=False, server_default='1')
+    
+    __mapper_args__ = {'version_id_col': version_id}
     
     # Relationships
     student = relationship("Student", back_populates="grades")
     course = relationship("Course", back_populates="grades")
+    term = relationship("Term", back_populates="grades")
     
     def __repr__(self):
         return f"<Grade - Student: {self.student_id}, Course: {self.course_id}, GP: {self.grade_point}>"
@@ -42,6 +75,9 @@ class Student(Base):
     email = Column(String(100), unique=True, nullable=False)
     date_of_birth = Column(DateTime)
     created_at = Column(DateTime, default=datetime.utcnow)
+    version_id = Column(Integer, nullable=False, server_default='1')
+    
+    __mapper_args__ = {'version_id_col': version_id}
     
     # Relationships
     courses = relationship('Course', secondary=enrollment, back_populates='students')
@@ -52,38 +88,11 @@ class Student(Base):
     
     def calculate_cgpa(self, session):
         """Calculate CGPA for the student across all courses"""
-        total_credits = 0
-        weighted_sum = 0
-        
-        for grade in self.grades:
-            course = grade.course
-            weighted_sum += grade.grade_point * course.credits
-            total_credits += course.credits
-            
-        if total_credits == 0:
-            return 0.0
-        
-        return round(weighted_sum / total_credits, 2)
+        return calculate_cgpas(session, [self.id])[self.id]
     
     def calculate_semester_gpa(self, session, semester):
         """Calculate GPA for a specific semester"""
-        total_credits = 0
-        weighted_sum = 0
-        
-        semester_grades = session.query(Grade).filter(
-            Grade.student_id == self.id,
-            Grade.semester == semester
-        ).all()
-        
-        for grade in semester_grades:
-            course = grade.course
-            weighted_sum += grade.grade_point * course.credits
-            total_credits += course.credits
-            
-        if total_credits == 0:
-            return 0.0
-        
-        return round(weighted_sum / total_credits, 2)
+        return calculate_semester_gpas(session, [self.id], semester)[(self.id, semester)]
 
 class Course(Base):
     __tablename__ = 'courses'
@@ -96,6 +105,9 @@ class Course(Base):
     max_students = Column(Integer)
     is_active = Column(Boolean, default=True)
     created_at = Column(DateTime, default=datetime.utcnow)
+    version_id = Column(Integer, nullable=False, server_default='1')
+    
+    __mapper_args__ = {'version_id_col': version_id}
     
     # Relationships
     students = relationship('Student', secondary=enrollment, back_populates='courses')
@@ -104,11 +116,691 @@ class Course(Base):
     def __repr__(self):
         return f"<Course {self.course_code}: {self.title}>"
 
-# Create SQLite database engine
-engine = create_engine('sqlite:///school.db', echo=True)
+# GPA summary tables
+# Running totals of grade_point * credits and credits per student and per
+# student-semester. They are maintained by SQLite triggers on grades and
+# courses, so every writer (ORM, Core bulk inserts, other clients) keeps them
+# current inside its own transaction. Grade points are counted in whole
+# hundredths (GPA_SCALE), so the totals are exact integers whatever order
+# grades are added and removed in; read GPAs through summary_gpa or _gpa.
+GPA_SCALE = 100
+
+def scaled_points(grade_point):
+    """SQL for a grade point column in hundredths, as summed into weighted_sum"""
+    return f"CAST(round({grade_point} * {GPA_SCALE}) AS INTEGER)"
+
+gpa_summary = Table(
+    'gpa_summary',
+    Base.metadata,
+    Column('student_id', Integer, ForeignKey('students.id'), primary_key=True),
+    Column('weighted_sum', Float, nullable=False, default=0.0),
+    Column('total_credits', Integer, nullable=False, default=0)
+)
+
+semester_gpa_summary = Table(
+    'semester_gpa_summary',
+    Base.metadata,
+    Column('student_id', Integer, ForeignKey('students.id'), primary_key=True),
+    Column('semester', String(20), primary_key=True),
+    Column('weighted_sum', Float, nullable=False, default=0.0),
+    Column('total_credits', Integer, nullable=False, default=0)
+)
+
+_GPA_ADD = """
+    INSERT INTO gpa_summary (student_id, weighted_sum, total_credits)
+    SELECT {row}.student_id, {points} * credits, credits
+    FROM courses WHERE id = {row}.course_id
+    ON CONFLICT (student_id) DO UPDATE SET
+        weighted_sum = weighted_sum + excluded.weighted_sum,
+        total_credits = total_credits + excluded.total_credits;
+    INSERT INTO semester_gpa_summary (student_id, semester, weighted_sum, total_credits)
+    SELECT {row}.student_id, {row}.semester, {points} * credits, credits
+    FROM courses WHERE id = {row}.course_id
+    ON CONFLICT (student_id, semester) DO UPDATE SET
+        weighted_sum = weighted_sum + excluded.weighted_sum,
+        total_credits = total_credits + excluded.total_credits;
+"""
+
+_GPA_SUBTRACT = """
+    UPDATE gpa_summary SET
+        weighted_sum = weighted_sum - {points} * (SELECT credits FROM courses WHERE id = {row}.course_id),
+        total_credits = total_credits - (SELECT credits FROM courses WHERE id = {row}.course_id)
+    WHERE student_id = {row}.student_id;
+    UPDATE semester_gpa_summary SET
+        weighted_sum = weighted_sum - {points} * (SELECT credits FROM courses WHERE id = {row}.course_id),
+        total_credits = total_credits - (SELECT credits FROM courses WHERE id = {row}.course_id)
+    WHERE student_id = {row}.student_id AND semester = {row}.semester;
+"""
+
+_GPA_CREDITS_CHANGE = """
+    UPDATE {table} SET
+        weighted_sum = weighted_sum + (NEW.credits - OLD.credits) * (
+            SELECT sum({points}) FROM grades
+            WHERE grades.course_id = NEW.id AND grades.student_id = {table}.student_id{semester_match}),
+        total_credits = total_credits + (NEW.credits - OLD.credits) * (
+            SELECT count(*) FROM grades
+            WHERE grades.course_id = NEW.id AND grades.student_id = {table}.student_id{semester_match})
+    WHERE EXISTS (
+        SELECT 1 FROM grades
+        WHERE grades.course_id = NEW.id AND grades.student_id = {table}.student_id{semester_match});
+"""
+
+def _gpa_change(template, row):
+    return template.format(row=row, points=scaled_points(f'{row}.grade_point'))
+
+GPA_TRIGGERS = {
+    'grades_gpa_insert': "AFTER INSERT ON grades BEGIN" + _gpa_change(_GPA_ADD, 'NEW') + "END",
+    'grades_gpa_delete': "AFTER DELETE ON grades BEGIN" + _gpa_change(_GPA_SUBTRACT, 'OLD') + "END",
+    'grades_gpa_update': (
+        "AFTER UPDATE OF student_id, course_id, semester, grade_point ON grades BEGIN"
+        + _gpa_change(_GPA_SUBTRACT, 'OLD') + _gpa_change(_GPA_ADD, 'NEW') + "END"
+    ),
+    'courses_gpa_credits': (
+        "AFTER UPDATE OF credits ON courses BEGIN"
+        + _GPA_CREDITS_CHANGE.format(table='gpa_summary', semester_match='', points=scaled_points('grade_point'))
+        + _GPA_CREDITS_CHANGE.format(
+            table='semester_gpa_summary',
+            semester_match=' AND grades.semester = semester_gpa_summary.semester',
+            points=scaled_points('grade_point'))
+        + "END"
+    ),
+    # The summaries reference students, so they must go before the student does
+    'students_gpa_delete': (
+        "BEFORE DELETE ON students BEGIN"
+        " DELETE FROM gpa_summary WHERE student_id = OLD.id;"
+        " DELETE FROM semester_gpa_summary WHERE student_id = OLD.id;"
+        " END"
+    ),
+}
+
+def _gpa(weighted_sum, total_credits):
+    """GPA from summary totals, rounded half up to two places"""
+    if not total_credits:
+        return 0.0
+    # Integer arithmetic, so a GPA that is exactly on .xx5 always rounds up
+    return (2 * int(weighted_sum) + total_credits) // (2 * total_credits) / GPA_SCALE
+
+def summary_gpa(summary):
+    """SQL expression for the GPA of a gpa_summary or semester_gpa_summary row; see _gpa"""
+    return case(
+        (summary.c.total_credits > 0,
+         func.cast((2 * summary.c.weighted_sum + summary.c.total_credits) / (2 * summary.c.total_credits),
+                   Integer) / float(GPA_SCALE)),
+        else_=0.0
+    )
+
+# SQLite caps the number of bound parameters per statement, so large id
+# lists are split into chunks of this size.
+GPA_CHUNK_SIZE = 500
+
+def chunks(ids, size=GPA_CHUNK_SIZE):
+    ids = list(ids)
+    for start in range(0, len(ids), size):
+        yield ids[start:start + size]
+
+def _graded(session):
+    """grades, plus archived grades of current students if an archive is attached"""
+    def columns(table):
+        return select(table.c.student_id, table.c.course_id, table.c.semester, table.c.grade_point)
+    if not archive_available(session.connection()):
+        return Grade.__table__
+    return union_all(
+        columns(Grade.__table__),
+        columns(archived_grades).where(archived_grades.c.student_id.in_(select(Student.id)))
+    ).subquery()
+
+def _gpa_query(session, *names):
+    """Aggregate GPA totals straight from grades, bypassing the summaries"""
+    grades = _graded(session)
+    group_by = [grades.c[name] for name in names]
+    return session.query(
+        *group_by,
+        func.sum(func.cast(func.round(grades.c.grade_point * GPA_SCALE), Integer) * Course.credits),
+        func.sum(Course.credits)
+    ).select_from(grades).join(Course, grades.c.course_id == Course.id).group_by(*group_by)
+
+def calculate_cgpas(session, student_ids=None):
+    """Calculate credit-weighted CGPAs for many students at once.
+
+    Returns a dict of student id -> CGPA. When student_ids is None every
+    student with grades is included; otherwise every requested id is present
+    and students without grades map to 0.0.
+    """
+    query = session.query(
+        gpa_summary.c.student_id, gpa_summary.c.weighted_sum, gpa_summary.c.total_credits
+    )
+    if student_ids is None:
+        return {student_id: _gpa(weighted, credits) for student_id, weighted, credits in query}
+    
+    cgpas = dict.fromkeys(student_ids, 0.0)
+    for chunk in chunks(cgpas):
+        for student_id, weighted, credits in query.filter(gpa_summary.c.student_id.in_(chunk)):
+            cgpas[student_id] = _gpa(weighted, credits)
+    return cgpas
+
+def calculate_semester_gpas(session, student_ids=None, semester=None):
+    """Calculate credit-weighted semester GPAs for many students at once.
+
+    Returns a dict of (student id, semester) -> GPA, optionally restricted to
+    one semester. If both student_ids and semester are given every requested
+    pair is present, with 0.0 for students without grades that semester.
+    """
+    summary = semester_gpa_summary.c
+    query = session.query(summary.student_id, summary.semester, summary.weighted_sum, summary.total_credits)
+    if semester is not None:
+        query = query.filter(summary.semester == semester)
+    if student_ids is None:
+        return {(student_id, sem): _gpa(weighted, credits)
+                for student_id, sem, weighted, credits in query}
+    
+    gpas = {}
+    if semester is not None:
+        gpas = {(student_id, semester): 0.0 for student_id in student_ids}
+    for chunk in chunks(student_ids):
+        for student_id, sem, weighted, credits in query.filter(summary.student_id.in_(chunk)):
+            gpas[(student_id, sem)] = _gpa(weighted, credits)
+    return gpas
+
+def rebuild_gpa_summaries(session):
+    """Recompute both GPA summary tables from the grades table and the archive"""
+    session.execute(gpa_summary.delete())
+    session.execute(semester_gpa_summary.delete())
+    session.execute(gpa_summary.insert().from_select(
+        ['student_id', 'weighted_sum', 'total_credits'],
+        _gpa_query(session, 'student_id').statement
+    ))
+    session.execute(semester_gpa_summary.insert().from_select(
+        ['student_id', 'semester', 'weighted_sum', 'total_credits'],
+        _gpa_query(session, 'student_id', 'semester').statement
+    ))
+
+def verify_gpa_summaries(session, tolerance=1e-6):
+    """Compare the GPA summaries with a fresh aggregate over grades and the archive.
+
+    Returns a list of (key, expected, stored) tuples, where the values are
+    (weighted_sum, total_credits) pairs, for every student or student-semester
+    whose totals differ; an empty list means the summaries are correct.
+    """
+    mismatches = []
+    checks = [
+        (('student_id',), gpa_summary),
+        (('student_id', 'semester'), semester_gpa_summary),
+    ]
+    for group_by, summary in checks:
+        expected = {tuple(row[:-2]): tuple(row[-2:]) for row in _gpa_query(session, *group_by)}
+        stored = {tuple(row[:-2]): tuple(row[-2:]) for row in session.query(summary)}
+        for key in expected.keys() | stored.keys():
+            expected_sum, expected_credits = expected.get(key, (0.0, 0))
+            stored_sum, stored_credits = stored.get(key, (0.0, 0))
+            if expected_credits != stored_credits or abs(expected_sum - stored_sum) > tolerance:
+                mismatches.append((key if len(key) > 1 else key[0], expected.get(key), stored.get(key)))
+    return mismatches
+
+def install_gpa_summaries(conn):
+    """Create the GPA triggers if missing, seeding the summaries from grades"""
+    existing = {row[0] for row in conn.exec_driver_sql(
+        "SELECT name FROM sqlite_master WHERE type = 'trigger'"
+    )}
+    missing = [name for name in GPA_TRIGGERS if name not in existing]
+    if not missing:
+        return
+    for name in missing:
+        conn.exec_driver_sql(f"CREATE TRIGGER {name} {GPA_TRIGGERS[name]}")
+    rebuild_gpa_summaries(SessionBase(bind=conn))
+
+def reinstall_gpa_summaries(conn):
+    """Replace the GPA triggers, which first kept floating-point totals, and rebuild the summaries"""
+    for name in GPA_TRIGGERS:
+        conn.exec_driver_sql(f"DROP TRIGGER IF EXISTS {name}")
+    install_gpa_summaries(conn)
+
+# Full-text search index
+# FTS5 tables over the searchable columns of students and courses. They are
+# external-content tables (the text lives only in students/courses) kept in
+# sync by triggers; prefix='2 3' adds prefix indexes so short search-as-you-
+# type prefixes are answered from the index without expanding every term.
+SEARCH_TABLES = {
+    'student_search': ('students', ['student_number', 'first_name', 'last_name', 'email']),
+    'course_search': ('courses', ['course_code', 'title']),
+}
+
+def _search_triggers(name, table, columns):
+    column_list = ', '.join(columns)
+    def values(row):
+        return ', '.join(f"{row}.{column}" for column in columns)
+    delete = f" INSERT INTO {name}({name}, rowid, {column_list}) VALUES ('delete', OLD.id, {values('OLD')});"
+    insert = f" INSERT INTO {name}(rowid, {column_list}) VALUES (NEW.id, {values('NEW')});"
+    return {
+        f'{table}_search_insert': f"AFTER INSERT ON {table} BEGIN{insert} END",
+        f'{table}_search_delete': f"AFTER DELETE ON {table} BEGIN{delete} END",
+        f'{table}_search_update': f"AFTER UPDATE OF {column_list} ON {table} BEGIN{delete}{insert} END",
+    }
+
+SEARCH_TRIGGERS = {
+    trigger: body
+    for name, (table, columns) in SEARCH_TABLES.items()
+    for trigger, body in _search_triggers(name, table, columns).items()
+}
+
+def rebuild_search_index(session):
+    """Repopulate the search index from the students and courses tables"""
+    for name in SEARCH_TABLES:
+        session.connection().exec_driver_sql(f"INSERT INTO {name}({name}) VALUES ('rebuild')")
+
+def install_search_index(conn):
+    """Create the search tables and their triggers if missing, then build the index"""
+    existing = {row[0] for row in conn.exec_driver_sql(
+        "SELECT name FROM sqlite_master WHERE type IN ('table', 'trigger')"
+    )}
+    for name, (table, columns) in SEARCH_TABLES.items():
+        if name not in existing:
+            conn.exec_driver_sql(
+                f"CREATE VIRTUAL TABLE {name} USING fts5("
+                f"{', '.join(columns)}, content='{table}', content_rowid='id', prefix='2 3')"
+            )
+    for name, body in SEARCH_TRIGGERS.items():
+        if name not in existing:
+            conn.exec_driver_sql(f"CREATE TRIGGER {name} {body}")
+    rebuild_search_index(SessionBase(bind=conn))
+
+# Version stamps
+# A counter per table, bumped by triggers whenever a row's cached columns
+# change or the row is deleted, so in-process caches (see db_lookup) can
+# tell that another connection or process has changed the data. Inserts do
+# not bump it: a new id cannot be stale in a cache keyed by id.
+table_versions = Table(
+    'table_versions',
+    Base.metadata,
+    Column('name', String(50), primary_key=True),
+    Column('version', Integer, nullable=False, default=0)
+)
 
-# Create all tables
-Base.metadata.create_all(engine)
+VERSIONED_TABLES = {
+    'students': ['student_number', 'first_name', 'last_name', 'email'],
+    'courses': ['course_code', 'title', 'credits', 'is_active'],
+}
+
+def _version_triggers(table, columns):
+    bump = f" UPDATE table_versions SET version = version + 1 WHERE name = '{table}'; END"
+    return {
+        f'{table}_version_update': f"AFTER UPDATE OF {', '.join(columns)} ON {table} BEGIN" + bump,
+        f'{table}_version_delete': f"AFTER DELETE ON {table} BEGIN" + bump,
+    }
+
+VERSION_TRIGGERS = {
+    trigger: body
+    for table, columns in VERSIONED_TABLES.items()
+    for trigger, body in _version_triggers(table, columns).items()
+}
+
+def install_table_versions(conn):
+    """Create the version rows and their triggers if missing"""
+    existing = {row[0] for row in conn.exec_driver_sql(
+        "SELECT name FROM sqlite_master WHERE type = 'trigger'"
+    )}
+    for table in VERSIONED_TABLES:
+        conn.exec_driver_sql(f"INSERT OR IGNORE INTO table_versions (name, version) VALUES ('{table}', 0)")
+    for name, body in VERSION_TRIGGERS.items():
+        if name not in existing:
+            conn.exec_driver_sql(f"CREATE TRIGGER {name} {body}")
+
+# Terms
+# Every distinct grade semester has a row in terms, created and linked by
+# triggers when a grade is written, so grades can be filtered and ordered by
+# an integer term key. Grades cannot be added to a closed term or moved into
+# or out of one; closed terms can then be archived (see db_archive).
+_TERM_KEY = """coalesce(
+    CASE WHEN {name} GLOB '*[^0-9][0-9][0-9][0-9][0-9]' THEN
+        CAST(substr({name}, -4) AS INTEGER) * 10 + CASE lower(trim(substr({name}, 1, length({name}) - 4)))
+            WHEN 'winter' THEN 1 WHEN 'spring' THEN 2 WHEN 'summer' THEN 3
+            WHEN 'fall' THEN 4 WHEN 'autumn' THEN 4 END
+    END,
+    (SELECT max(coalesce(max(id), 0), 99999) + 1 FROM terms))"""
+
+# The term a semester name links to: its own row, else the term with its key
+_TERM_OF = "coalesce((SELECT id FROM terms WHERE name = {name}), " + _TERM_KEY + ")"
+
+def _link_term(row):
+    # A name whose key is taken (another spelling of the same term) links to that term
+    return (
+        f" INSERT OR IGNORE INTO terms (id, name, is_closed)"
+        f" SELECT {_TERM_KEY.format(name=row + '.semester')}, {row}.semester, 0"
+        f" WHERE NOT EXISTS (SELECT 1 FROM terms WHERE name = {row}.semester);"
+        f" UPDATE grades SET term_id = {_TERM_OF.format(name=row + '.semester')}"
+        f" WHERE id = {row}.id;"
+    )
+
+_CLOSED = "EXISTS (SELECT 1 FROM terms WHERE id = " + _TERM_OF + " AND is_closed)"
+_REJECT_CLOSED = " SELECT RAISE(ABORT, 'grades of a closed term cannot be changed'); END"
+
+TERM_TRIGGERS = {
+    'grades_term_insert': "AFTER INSERT ON grades BEGIN" + _link_term('NEW') + " END",
+    'grades_term_update': "AFTER UPDATE OF semester ON grades BEGIN" + _link_term('NEW') + " END",
+    'grades_closed_insert': (
+        f"BEFORE INSERT ON grades WHEN {_CLOSED.format(name='NEW.semester')} BEGIN" + _REJECT_CLOSED
+    ),
+    'grades_closed_update': (
+        f"BEFORE UPDATE OF student_id, course_id, semester, grade_point ON grades"
+        f" WHEN {_CLOSED.format(name='OLD.semester')} OR {_CLOSED.format(name='NEW.semester')} BEGIN"
+        + _REJECT_CLOSED
+    ),
+}
+
+def install_terms(conn):
+    """Add grades.term_id if missing, fill terms from the grades and create the term triggers"""
+    columns = {row[1] for row in conn.exec_driver_sql("PRAGMA main.table_info(grades)")}
+    if 'term_id' not in columns:
+        conn.exec_driver_sql("ALTER TABLE grades ADD COLUMN term_id INTEGER REFERENCES terms(id)")
+    for index in Grade.__table__.indexes:
+        if index.name == 'ix_grades_term':
+            index.create(conn, checkfirst=True)
+    semesters = [row[0] for row in conn.exec_driver_sql("SELECT DISTINCT semester FROM grades")]
+    for semester in semesters:
+        # One at a time: the fallback key reads the ids inserted so far
+        conn.exec_driver_sql(
+            f"INSERT OR IGNORE INTO terms (id, name, is_closed) SELECT {_TERM_KEY.format(name=':semester')}, :semester, 0"
+            " WHERE NOT EXISTS (SELECT 1 FROM terms WHERE name = :semester)",
+            {'semester': semester}
+        )
+    conn.exec_driver_sql(
+        f"UPDATE grades SET term_id = coalesce((SELECT id FROM terms WHERE name = grades.semester),"
+        f" {_TERM_KEY.format(name='grades.semester')}) WHERE term_id IS NULL"
+    )
+    existing = {row[0] for row in conn.exec_driver_sql(
+        "SELECT name FROM sqlite_master WHERE type = 'trigger'"
+    )}
+    for name, body in TERM_TRIGGERS.items():
+        if name not in existing:
+            conn.exec_driver_sql(f"CREATE TRIGGER {name} {body}")
+
+def reinstall_closed_term_triggers(conn):
+    """Replace the closed-term triggers, which first matched terms by exact name"""
+    for name in ('grades_closed_insert', 'grades_closed_update'):
+        conn.exec_driver_sql(f"DROP TRIGGER IF EXISTS {name}")
+        conn.exec_driver_sql(f"CREATE TRIGGER {name} {TERM_TRIGGERS[name]}")
+
+def is_term_closed(conn, semester):
+    """Whether grades for this semester name would be rejected as belonging to a closed term"""
+    return bool(conn.exec_driver_sql(
+        f"SELECT {_CLOSED.format(name=':semester')}", {'semester': semester}
+    ).scalar())
+
+# Archive tables
+# Grades and enrollments of archived terms live in a separate SQLite file,
+# attached to every connection under ARCHIVE_SCHEMA (see db_connection and
+# db_archive). The tables mirror their main-file counterparts without
+# foreign keys, which SQLite cannot enforce across files.
+archive_metadata = MetaData(schema=ARCHIVE_SCHEMA)
+
+archived_grades = Table(
+    'grades',
+    archive_metadata,
+    Column('id', Integer, primary_key=True),
+    Column('student_id', Integer, nullable=False),
+    Column('course_id', Integer, nullable=False),
+    Column('semester', String(20), nullable=False),
+    Column('grade_point', Float, nullable=False),
+    Column('created_at', DateTime),
+    Column('term_id', Integer, nullable=False),
+    Index('ix_archived_grades_student_term', 'student_id', 'term_id'),
+    Index('ix_archived_grades_term', 'term_id')
+)
+
+archived_enrollment = Table(
+    'enrollment',
+    archive_metadata,
+    Column('student_id', Integer, primary_key=True),
+    Column('course_id', Integer, primary_key=True),
+    Column('enrollment_date', DateTime),
+    Column('is_active', Boolean),
+    Column('term_id', Integer, nullable=False),  # the term it was archived with
+    Index('ix_archived_enrollment_course', 'course_id', 'student_id')
+)
+
+def archive_available(conn):
+    """Whether the archive is attached and has been created"""
+    return conn.exec_driver_sql(
+        f"SELECT EXISTS (SELECT 1 FROM pragma_database_list WHERE name = '{ARCHIVE_SCHEMA}')"
+    ).scalar() and conn.exec_driver_sql(
+        f"SELECT EXISTS (SELECT 1 FROM {ARCHIVE_SCHEMA}.sqlite_master WHERE name = 'grades')"
+    ).scalar()
+
+# Row versions
+# Students, courses and grades carry a version_id that the ORM checks and
+# bumps on every UPDATE and DELETE (version_id_col), so a write based on a
+# row that another client changed since it was read fails with StaleDataError
+# instead of silently overwriting that change. Writers that bypass the ORM
+# (Core statements, other programs) bump it through these triggers, which
+# leave alone updates that already set a new version.
+VERSIONED_MODELS = (Student, Course, Grade)
+
+def _row_version_trigger(table):
+    columns = [column.name for column in table.columns if column.name not in ('id', 'version_id', 'term_id')]
+    return (
+        f"AFTER UPDATE OF {', '.join(columns)} ON {table.name} WHEN NEW.version_id = OLD.version_id BEGIN"
+        f" UPDATE {table.name} SET version_id = OLD.version_id + 1 WHERE id = NEW.id; END"
+    )
+
+ROW_VERSION_TRIGGERS = {
+    f'{model.__tablename__}_row_version': _row_version_trigger(model.__table__) for model in VERSIONED_MODELS
+}
+
+def install_row_versions(conn):
+    """Add the version_id columns if missing and create their triggers"""
+    for model in VERSIONED_MODELS:
+        table = model.__tablename__
+        columns = {row[1] for row in conn.exec_driver_sql(f"PRAGMA main.table_info({table})")}
+        if 'version_id' not in columns:
+            conn.exec_driver_sql(f"ALTER TABLE {table} ADD COLUMN version_id INTEGER NOT NULL DEFAULT 1")
+    existing = {row[0] for row in conn.exec_driver_sql(
+        "SELECT name FROM sqlite_master WHERE type = 'trigger'"
+    )}
+    for name, body in ROW_VERSION_TRIGGERS.items():
+        if name not in existing:
+            conn.exec_driver_sql(f"CREATE TRIGGER {name} {body}")
+
+# Schema migrations
+# create_all only creates missing tables (with their indexes); it never
+# changes a table that already exists. Changes to existing databases are
+# ordered steps recorded in schema_version, each run in its own transaction.
+schema_version = Table(
+    'schema_version',
+    Base.metadata,
+    Column('version', Integer, primary_key=True),
+    Column('description', String(200), nullable=False),
+    Column('applied_at', DateTime, default=datetime.utcnow)
+)
+
+# Migrations name what they create rather than reading the current models,
+# whose later columns and indexes may not exist yet at that step
+LOOKUP_INDEXES = ('ix_grades_student_semester', 'ix_grades_course', 'ix_enrollment_course')
+
+def _create_lookup_indexes(conn):
+    for index in (*Grade.__table__.indexes, *enrollment.indexes):
+        if index.name in LOOKUP_INDEXES:
+            index.create(conn, checkfirst=True)
+
+MIGRATIONS = [
+    (1, "GPA summary triggers", install_gpa_summaries),
+    (2, "Indexes for grade and enrollment lookups", _create_lookup_indexes),
+    (3, "Delete GPA summaries with their student", install_gpa_summaries),
+    (4, "Full-text search index for students and courses", install_search_index),
+    (5, "Version stamps for cached student and course data", install_table_versions),
+    (6, "Terms table and grade term keys", install_terms),
+    (7, "Row versions for optimistic concurrency", install_row_versions),
+    (8, "Closed-term checks by term key", reinstall_closed_term_triggers),
+    (9, "Exact GPA totals", reinstall_gpa_summaries),
+]
+
+def current_schema_version(conn):
+    return conn.execute(func.max(schema_version.c.version).select()).scalar() or 0
+
+def upgrade_schema(engine):
+    """Create missing tables and apply pending migrations in order.
+
+    Returns the list of (version, description) steps that were applied.
+    """
+    Base.metadata.create_all(engine)
+    with engine.connect() as conn:
+        current = current_schema_version(conn)
+    
+    applied = []
+    for version, description, step in MIGRATIONS:
+        if version <= current:
+            continue
+        with engine.begin() as conn:
+            step(conn)
+            conn.execute(schema_version.insert().values(version=version, description=description))
+        applied.append((version, description))
+    return applied
+
+# Shared SQLite engine; see db_connection for configuration
+engine = get_engine()
 
 # Create session factory
-Session = sessionmaker(bind=engine)
\ No newline at end of file
+Session = sessionmaker(bind=engine)
+
+# Schema setup is deferred until the first session is opened (or started
+# early in the background, as the login screen does) so importing this module
+# never touches the database.
+_schema_lock = threading.Lock()
+_schema_ready = False
+
+def ensure_schema():
+    """Apply upgrade_schema once per process; safe to call from any thread"""
+    global _schema_ready
+    if _schema_ready:
+        return
+    with _schema_lock:
+        if not _schema_ready:
+            upgrade_schema(engine)
+            _schema_ready = True
+
+def open_session():
+    """Return a new Session, making sure the schema is up to date first"""
+    ensure_schema()
+    return Session()
+
+def run_unit_of_work(fn, *args, retries=BUSY_RETRIES, retry_conflicts=False, session_factory=None):
+    """Run fn(session, *args) as one short transaction in a session of its own.
+
+    If SQLite reports the database busy or locked, the whole unit is run
+    again in a new session after a growing delay, up to `retries` times;
+    with retry_conflicts, so is a unit whose versioned write found the row
+    changed by another client (StaleDataError). fn must therefore read what
+    it changes and be safe to run again. Returns fn's result.
+    """
+    session_factory = session_factory or open_session
+    for attempt in itertools.count():
+        session = session_factory()
+        try:
+            result = fn(session, *args)
+            session.commit()
+            return result
+        except Exception as e:
+            session.rollback()
+            retryable = is_busy_error(e) or (retry_conflicts and isinstance(e, StaleDataError))
+            if attempt >= retries or not retryable:
+                raise
+        finally:
+            session.close()
+        time.sleep(busy_delay(attempt))
+
+# Change notification
+# Listeners are called after every commit that wrote ORM objects, with a dict
+# of table name -> {'inserted': set, 'updated': set, 'deleted': set} of
+# primary-key tuples. Enrollment rows written through Student.courses or
+# Course.students are reported under 'enrollment', and grade writes report the
+# students whose GPA changed as updates to 'gpa_summary' and the (student,
+# semester) pairs as updates to 'semester_gpa_summary'. Listeners run on
+# the committing thread. Core statements are only reported if their caller
+# passes the keys to record_change; bulk loads (db_import) refresh instead.
+_change_listeners = []
+
+def add_change_listener(listener):
+    _change_listeners.append(listener)
+
+def remove_change_listener(listener):
+    _change_listeners.remove(listener)
+
+def record_change(session, table, kind, key):
+    """Report a row written with a Core statement to the change listeners"""
+    changes = session.info.setdefault('pending_changes', {})
+    tables = changes.setdefault(table, {'inserted': set(), 'updated': set(), 'deleted': set()})
+    tables[kind].add(key)
+
+def _record_enrollment_changes(session, obj, collection, key):
+    # Only what was changed in memory; never load the collection here
+    history = attributes.get_history(obj, collection, passive=attributes.PASSIVE_NO_INITIALIZE)
+    for other in history.added:
+        record_change(session, 'enrollment', 'inserted', key(obj, other))
+    for other in history.deleted:
+        record_change(session, 'enrollment', 'deleted', key(obj, other))
+
+@event.listens_for(SessionBase, 'after_flush')
+def _collect_changes(session, flush_context):
+    for kind, objects in (('inserted', session.new), ('updated', session.dirty), ('deleted', session.deleted)):
+        for obj in objects:
+            if kind == 'updated' and not session.is_modified(obj, include_collections=False):
+                modified = False
+            else:
+                modified = True
+                mapper = inspect(obj).mapper
+                key = tuple(mapper.primary_key_from_instance(obj))
+                record_change(session, mapper.local_table.name, kind, key)
+            
+            if isinstance(obj, Student):
+                _record_enrollment_changes(session, obj, 'courses', lambda s, c: (s.id, c.id))
+            elif isinstance(obj, Course):
+                _record_enrollment_changes(session, obj, 'students', lambda c, s: (s.id, c.id))
+            elif isinstance(obj, Grade) and modified:
+                history = attributes.get_history(obj, 'student_id')
+                for student_id in (obj.student_id, *history.deleted):
+                    record_change(session, 'gpa_summary', 'updated', (student_id,))
+                semesters = attributes.get_history(obj, 'semester')
+                for student_id in (obj.student_id, *history.deleted):
+                    for semester in (obj.semester, *semesters.deleted):
+                        record_change(session, 'semester_gpa_summary', 'updated', (student_id, semester))
+
+@event.listens_for(SessionBase, 'after_commit')
+def _publish_changes(session):
+    changes = session.info.pop('pending_changes', None)
+    if changes:
+        for listener in list(_change_listeners):
+            listener(changes)
+
+@event.listens_for(SessionBase, 'after_rollback')
+def _discard_changes(session):
+    session.info.pop('pending_changes', None)
+
+if __name__ == "__main__":
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="School database maintenance")
+    parser.add_argument('--migrate', action='store_true', help="apply pending schema migrations")
+    parser.add_argument('--rebuild-gpa', action='store_true', help="recompute the GPA summary tables")
+    parser.add_argument('--verify-gpa', action='store_true', help="check the GPA summary tables against grades")
+    parser.add_argument('--rebuild-search', action='store_true', help="repopulate the student and course search index")
+    args = parser.parse_args()
+    
+    if args.migrate:
+        for version, description in upgrade_schema(engine):
+            print(f"Applied migration {version}: {description}")
+    session = open_session()
+    if args.migrate:
+        print(f"Schema is at version {current_schema_version(session.connection())}")
+    if args.rebuild_gpa:
+        rebuild_gpa_summaries(session)
+        session.commit()
+        print("GPA summaries rebuilt")
+    if args.rebuild_search:
+        rebuild_search_index(session)
+        session.commit()
+        print("Search index rebuilt")
+    if args.verify_gpa:
+        mismatches = verify_gpa_summaries(session)
+        for key, expected, stored in mismatches:
+            print(f"{key}: expected {expected}, stored {stored}")
+        print(f"{len(mismatches)} GPA mismatches")
+        if mismatches:
+            raise SystemExit(1)
@@ -0,0 +1,132 @@
+# db_queries.py
+# Column-only listing queries shared by the GUI tables and scripts. Each
+# listing is a single joined SELECT of plain values, so no ORM objects are
+# built and no relationship is lazy-loaded per row.
+from sqlalchemy import select
+
+from db_models import Student, Course, Grade, enrollment, gpa_summary, semester_gpa_summary
+
+STUDENT_NAME = Student.first_name + ' ' + Student.last_name
+
+# Rows are pulled from the cursor in batches of this size when streaming
+STREAM_BATCH_SIZE = 1000
+
+
+def enrollment_listing_from(query):
+    """Add the FROM clause and joins behind the enrollment listing"""
+    return query.select_from(enrollment).join(
+        Student, Student.id == enrollment.c.student_id
+    ).join(
+        Course, Course.id == enrollment.c.course_id
+    )
+
+
+def grade_listing_from(query):
+    """Add the FROM clause and joins behind the grade listing"""
+    return query.select_from(Grade).join(
+        Student, Student.id == Grade.student_id
+    ).join(
+        Course, Course.id == Grade.course_id
+    )
+
+
+def enrollment_listing(student_id=None, course_id=None):
+    """Select (student, course, enrollment_date) rows, optionally filtered"""
+    query = enrollment_listing_from(select(
+        STUDENT_NAME.label('student'),
+        Course.course_code.label('course'),
+        enrollment.c.enrollment_date
+    ))
+    if student_id is not None:
+        query = query.where(enrollment.c.student_id == student_id)
+    if course_id is not None:
+        query = query.where(enrollment.c.course_id == course_id)
+    return query.order_by(enrollment.c.student_id, enrollment.c.course_id)
+
+
+def grade_listing(student_id=None, course_id=None, semester=None):
+    """Select (student, course, semester, grade_point, created_at) rows, optionally filtered"""
+    query = grade_listing_from(select(
+        STUDENT_NAME.label('student'),
+        Course.course_code.label('course'),
+        Grade.semester,
+        Grade.grade_point,
+        Grade.created_at
+    ))
+    if student_id is not None:
+        query = query.where(Grade.student_id == student_id)
+    if course_id is not None:
+        query = query.where(Grade.course_id == course_id)
+    if semester is not None:
+        query = query.where(Grade.semester == semester)
+    return query.order_by(Grade.id)
+
+
+def iter_enrollments(session, student_id=None, course_id=None, batch_size=STREAM_BATCH_SIZE):
+    """Stream enrollment listing rows with one query, batch_size rows at a time"""
+    return session.execute(
+        enrollment_listing(student_id, course_id),
+        execution_options={'yield_per': batch_size}
+    )
+
+
+def iter_grades(session, student_id=None, course_id=None, semester=None, batch_size=STREAM_BATCH_SIZE):
+    """Stream grade listing rows with one query, batch_size rows at a time"""
+    return session.execute(
+        grade_listing(student_id, course_id, semester),
+        execution_options={'yield_per': batch_size}
+    )
+
+
+# Lookups the application runs constantly; each must be served by an index.
+# Sample values are inlined because only the shape of the plan matters.
+HOT_QUERIES = {
+    'cgpa by student': lambda: select(gpa_summary).where(gpa_summary.c.student_id.in_([1, 2])),
+    'semester gpa by student': lambda: select(semester_gpa_summary).where(
+        semester_gpa_summary.c.student_id == 1, semester_gpa_summary.c.semester == 'Fall 2024'),
+    'grades by student and semester': lambda: select(Grade).where(
+        Grade.student_id == 1, Grade.semester == 'Fall 2024'),
+    'grades by course': lambda: select(Grade).where(Grade.course_id == 1),
+    'grades by term': lambda: select(Grade).where(Grade.term_id == 20244),
+    'course roster': lambda: select(enrollment).where(enrollment.c.course_id == 1),
+    'student enrollments': lambda: select(enrollment).where(enrollment.c.student_id == 1),
+    'grade listing by student': lambda: grade_listing(student_id=1),
+    'grade listing by course': lambda: grade_listing(course_id=1),
+    'enrollment listing by course': lambda: enrollment_listing(course_id=1),
+}
+
+
+def query_plan(session, statement):
+    """Return the detail lines of EXPLAIN QUERY PLAN for a statement"""
+    sql = str(statement.compile(dialect=session.get_bind().dialect, compile_kwargs={'literal_binds': True}))
+    return [row[-1] for row in session.connection().exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}")]
+
+
+def check_query_plans(session):
+    """Return (name, plan line) for every hot query step that scans a table"""
+    return [
+        (name, detail)
+        for name, build in HOT_QUERIES.items()
+        for detail in query_plan(session, build())
+        if detail.startswith('SCAN ')
+    ]
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Inspect the application's hot queries")
+    parser.add_argument('--check-plans', action='store_true',
+                        help="fail if any hot query falls back to a table scan")
+    args = parser.parse_args()
+
+    from db_models import open_session
+
+    session = open_session()
+    if args.check_plans:
+        scans = check_query_plans(session)
+        for name, detail in scans:
+            print(f"{name}: {detail}")
+        print(f"{len(scans)} table scans in {len(HOT_QUERIES)} hot queries")
+        if scans:
+            raise SystemExit(1)
@@ -0,0 +1,99 @@
+# db_search.py
+# Prefix search over students and courses, served by the FTS5 index that
+# db_models keeps in sync (see SEARCH_TABLES there). Every word typed must
+# match the start of a word in one of the indexed columns, so "jo sm" finds
+# John Smith and "cs1" finds CS101. Results are ordered by FTS5 rank and cut
+# off at a limit, so a lookup costs milliseconds regardless of table size.
+import re
+
+from sqlalchemy import text
+
+# Matches returned per lookup unless the caller asks for more
+SEARCH_LIMIT = 20
+
+# Ranking has to score every match before the limit applies, which a one- or
+# two-letter prefix makes expensive (it matches most of the table) and
+# pointless. Queries whose longest word is shorter than this are returned in
+# index order instead, which lets the LIMIT stop the scan early.
+RANKED_MIN_LENGTH = 3
+
+_STUDENT_SEARCH = """
+    SELECT students.id, students.student_number, students.first_name, students.last_name
+    FROM student_search JOIN students ON students.id = student_search.rowid
+    WHERE student_search MATCH :match
+    {order}
+    LIMIT :limit
+"""
+
+_COURSE_SEARCH = """
+    SELECT courses.id, courses.course_code, courses.title
+    FROM course_search JOIN courses ON courses.id = course_search.rowid
+    WHERE course_search MATCH :match AND courses.is_active
+    {order}
+    LIMIT :limit
+"""
+
+
+def _words(query):
+    # Same word characters as FTS5's default unicode61 tokenizer
+    return re.findall(r'[^\W_]+', query)
+
+
+def match_expression(query):
+    """Turn typed text into an FTS5 query of quoted prefix terms, or None if it has no words"""
+    words = _words(query)
+    if not words:
+        return None
+    return ' '.join(f'"{word}"*' for word in words)
+
+
+def _search(session, sql, table, query, limit):
+    match = match_expression(query)
+    if match is None:
+        return []
+    ranked = max(len(word) for word in _words(query)) >= RANKED_MIN_LENGTH
+    order = f"ORDER BY {table}.rank" if ranked else ""
+    return session.execute(text(sql.format(order=order)), {'match': match, 'limit': limit}).all()
+
+
+def student_label(student_number, first_name, last_name):
+    return f"{student_number} - {first_name} {last_name}"
+
+
+def course_label(course_code, title):
+    return f"{course_code} - {title}"
+
+
+def search_students(session, query, limit=SEARCH_LIMIT):
+    """Return up to limit (label, student id) pairs matching query, best first"""
+    rows = _search(session, _STUDENT_SEARCH, 'student_search', query, limit)
+    return [(student_label(number, first_name, last_name), student_id)
+            for student_id, number, first_name, last_name in rows]
+
+
+def search_courses(session, query, limit=SEARCH_LIMIT):
+    """Return up to limit (label, course id) pairs of active courses matching query, best first"""
+    rows = _search(session, _COURSE_SEARCH, 'course_search', query, limit)
+    return [(course_label(code, title), course_id) for course_id, code, title in rows]
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="Search students or courses by prefix")
+    parser.add_argument('kind', choices=('students', 'courses'))
+    parser.add_argument('query')
+    parser.add_argument('--limit', type=int, default=SEARCH_LIMIT)
+    args = parser.parse_args()
+
+    from db_models import open_session
+
+    session = open_session()
+    search = search_students if args.kind == 'students' else search_courses
+    started = time.perf_counter()
+    matches = search(session, args.query, args.limit)
+    elapsed = time.perf_counter() - started
+    for label, _ in matches:
+        print(label)
+    print(f"{len(matches)} matches in {elapsed * 1000:.1f} ms")
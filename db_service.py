@@ -0,0 +1,228 @@
+# db_service.py
+# School operations shared by the GUI and batch scripts; nothing here
+# imports Qt.
+#
+# Every function takes the caller's session and leaves the commit to the
+# caller, so the GUI runs them as background tasks (gui_workers) and
+# scripts as units of work (db_models.run_unit_of_work): one call is one
+# transaction, retried as a whole if the database is busy. Batch writes cost
+# one lookup query per chunk of keys (db_models.chunks) and one executemany
+# per statement, whatever the batch size, and report the rows they wrote to
+# the change listeners like ORM commits do.
+#
+#   python db_service.py upsert-students students.csv
+#   python db_service.py post-grades CS101 "Fall 2025" grades.csv
+#   python db_service.py recompute-gpa [--verify]
+#   python db_service.py report class-rank --semester "Fall 2025"
+from datetime import datetime
+
+from sqlalchemy import bindparam, func, select
+
+from db_analytics import REPORTS, clear_cache, report_slug
+from db_enrollment import enroll_roster, student_ids_by_number
+from db_models import (Student, Course, Grade, gpa_summary, semester_gpa_summary, chunks, record_change,
+                       rebuild_gpa_summaries, verify_gpa_summaries)
+
+STUDENT_FIELDS = ('student_number', 'first_name', 'last_name', 'email', 'date_of_birth')
+REQUIRED_STUDENT_FIELDS = ('first_name', 'last_name', 'email')
+
+
+def add_student(session, values):
+    session.add(Student(**values))
+
+
+def add_course(session, values):
+    session.add(Course(**values))
+
+
+def add_grade(session, values):
+    session.add(Grade(**values))
+
+
+def enroll_numbers(session, course_id, student_numbers):
+    """Enroll students, by number, in one course.
+
+    Returns (enroll_roster results, unknown student numbers).
+    """
+    student_ids = student_ids_by_number(session, student_numbers)
+    unknown = [number for number in student_numbers if number not in student_ids]
+    known = [student_ids[number] for number in student_numbers if number in student_ids]
+    return enroll_roster(session, course_id, known), unknown
+
+
+def upsert_students(session, records):
+    """Create or update students keyed by student_number.
+
+    records are dicts of STUDENT_FIELDS; an existing student gets only the
+    fields given, a new one needs REQUIRED_STUDENT_FIELDS. Later records for
+    the same number override earlier ones. Returns (created, updated).
+    """
+    merged = {}
+    for record in records:
+        unknown = set(record) - set(STUDENT_FIELDS)
+        if unknown:
+            raise ValueError(f"Unknown student fields: {', '.join(sorted(unknown))}")
+        if not record.get('student_number'):
+            raise ValueError("Every student needs a student_number")
+        merged.setdefault(record['student_number'], {}).update(record)
+
+    existing = {}
+    for chunk in chunks(merged):
+        existing.update(session.execute(
+            select(Student.student_number, Student.id).where(Student.student_number.in_(chunk))
+        ).all())
+
+    new = [values for number, values in merged.items() if number not in existing]
+    for values in new:
+        missing = [field for field in REQUIRED_STUDENT_FIELDS if not values.get(field)]
+        if missing:
+            raise ValueError(f"New student {values['student_number']} needs {', '.join(missing)}")
+    if new:
+        rows = [{**dict.fromkeys(STUDENT_FIELDS), 'created_at': datetime.utcnow(), **values} for values in new]
+        for student_id in session.execute(Student.__table__.insert().returning(Student.id), rows).scalars():
+            record_change(session, 'students', 'inserted', (student_id,))
+
+    # executemany needs the same columns in every row, so updates are
+    # grouped by the fields they set
+    updates = {}
+    for number, values in merged.items():
+        if number in existing and len(values) > 1:
+            updates.setdefault(tuple(sorted(values)), []).append({**values, 'row_id': existing[number]})
+    students = Student.__table__
+    for rows in updates.values():
+        session.execute(students.update().where(students.c.id == bindparam('row_id')), rows)
+        for row in rows:
+            record_change(session, 'students', 'updated', (row['row_id'],))
+    return len(new), sum(len(rows) for rows in updates.values())
+
+
+def post_course_grades(session, course_code, semester, grades):
+    """Record a course's grades for one semester from (student_number, grade_point) pairs.
+
+    A student who already has a grade in the course that semester has it
+    replaced; otherwise a grade is added. Grade points must be 0.0 to 4.0.
+    Returns (added, replaced, unknown student numbers).
+    """
+    course_id = session.execute(select(Course.id).where(Course.course_code == course_code)).scalar()
+    if course_id is None:
+        raise ValueError(f"No course with code {course_code!r}")
+    posted = {}
+    for number, grade_point in grades:
+        grade_point = float(grade_point)
+        if not 0.0 <= grade_point <= 4.0:
+            raise ValueError(f"Grade point out of range for {number}: {grade_point}")
+        posted[number] = grade_point
+
+    student_ids = {}
+    for chunk in chunks(posted):
+        student_ids.update(student_ids_by_number(session, chunk))
+    unknown = [number for number in posted if number not in student_ids]
+    existing = {}
+    for grade_id, student_id in session.execute(
+        select(Grade.id, Grade.student_id).where(Grade.course_id == course_id, Grade.semester == semester)
+    ):
+        existing.setdefault(student_id, []).append(grade_id)
+
+    added = [{'student_id': student_ids[number], 'course_id': course_id, 'semester': semester,
+              'grade_point': grade_point, 'created_at': datetime.utcnow()}
+             for number, grade_point in posted.items()
+             if number in student_ids and student_ids[number] not in existing]
+    replaced = [{'row_id': grade_id, 'grade_point': grade_point}
+                for number, grade_point in posted.items() if number in student_ids
+                for grade_id in existing.get(student_ids[number], ())]
+    if added:
+        for grade_id in session.execute(Grade.__table__.insert().returning(Grade.id), added).scalars():
+            record_change(session, 'grades', 'inserted', (grade_id,))
+    if replaced:
+        grades_table = Grade.__table__
+        session.execute(grades_table.update().where(grades_table.c.id == bindparam('row_id')), replaced)
+        for row in replaced:
+            record_change(session, 'grades', 'updated', (row['row_id'],))
+    # The triggers have moved these students' GPA summaries
+    for number in posted:
+        if number in student_ids:
+            record_change(session, 'gpa_summary', 'updated', (student_ids[number],))
+            record_change(session, 'semester_gpa_summary', 'updated', (student_ids[number], semester))
+    return len(added), len(replaced), unknown
+
+
+def recompute_gpas(session):
+    """Rebuild the GPA summaries from the grades; returns (students, student-semesters) summarised"""
+    rebuild_gpa_summaries(session)
+    clear_cache()
+    return tuple(session.execute(select(func.count()).select_from(table)).scalar()
+                 for table in (gpa_summary, semester_gpa_summary))
+
+
+def run_report(session, name, semester=None):
+    """Return (headers, rows) of one of the db_analytics REPORTS"""
+    report, headers = REPORTS[name]
+    return headers, report(session, semester)
+
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+    import time
+
+    from db_import import UnreadableRow, read_rows
+    from db_models import run_unit_of_work
+
+    parser = argparse.ArgumentParser(description="Run school batch operations without the GUI")
+    commands = parser.add_subparsers(dest='command', required=True)
+    upsert = commands.add_parser('upsert-students', help="create or update students from a CSV or JSONL file")
+    upsert.add_argument('path', help="rows of student_number and any of the other student fields")
+    post = commands.add_parser('post-grades', help="record a course's grades for a semester")
+    post.add_argument('course_code')
+    post.add_argument('semester')
+    post.add_argument('path', help="CSV or JSONL rows of student_number and grade_point")
+    recompute = commands.add_parser('recompute-gpa', help="rebuild the GPA summaries from the grades")
+    recompute.add_argument('--verify', action='store_true', help="only report summaries that are wrong")
+    report = commands.add_parser('report', help="print a cohort or course report as tab-separated rows")
+    report.add_argument('name', choices=[report_slug(name) for name in REPORTS])
+    report.add_argument('--semester', help="limit the report to one semester (default: all grades)")
+    args = parser.parse_args()
+
+    def rows(path):
+        # A batch is all or nothing, so an unreadable line stops it
+        for line, row in read_rows(path):
+            if isinstance(row, UnreadableRow):
+                parser.error(f"{path} line {line}: {row.error}")
+            yield row
+
+    def student_record(row):
+        # Blank cells leave the field as it is
+        record = {field: str(value).strip() for field, value in row.items()
+                  if value is not None and str(value).strip()}
+        if 'date_of_birth' in record:
+            record['date_of_birth'] = datetime.fromisoformat(record['date_of_birth'])
+        return record
+
+    started = time.perf_counter()
+    if args.command == 'upsert-students':
+        records = [student_record(row) for row in rows(args.path)]
+        created, updated = run_unit_of_work(upsert_students, records)
+        print(f"{created} students created, {updated} updated", file=sys.stderr)
+    elif args.command == 'post-grades':
+        grades = [(str(row['student_number']).strip(), row['grade_point']) for row in rows(args.path)]
+        added, replaced, unknown = run_unit_of_work(post_course_grades, args.course_code, args.semester, grades)
+        for number in unknown:
+            print(f"{number}: unknown student number", file=sys.stderr)
+        print(f"{args.course_code} {args.semester}: {added} grades added, {replaced} replaced", file=sys.stderr)
+    elif args.command == 'recompute-gpa' and args.verify:
+        mismatches = run_unit_of_work(verify_gpa_summaries)
+        for key, expected, stored in mismatches:
+            print(f"{key}: expected {expected}, stored {stored}")
+        print(f"{len(mismatches)} GPA mismatches", file=sys.stderr)
+        if mismatches:
+            raise SystemExit(1)
+    elif args.command == 'recompute-gpa':
+        students, semesters = run_unit_of_work(recompute_gpas)
+        print(f"GPA summaries rebuilt for {students} students and {semesters} student-semesters", file=sys.stderr)
+    else:
+        name = next(name for name in REPORTS if report_slug(name) == args.name)
+        headers, rows = run_unit_of_work(run_report, name, args.semester)
+        print('\t'.join(headers))
+        for row in rows:
+            print('\t'.join(str(value) for value in row))
+    print(f"Done in {time.perf_counter() - started:.1f}s", file=sys.stderr)
@@ -2,7 +2,7 @@ from PyQt5.QtWidgets import (QApplication, QMainWindow, QDialog, QVBoxLayout,
                              QLabel, QLineEdit, QPushButton, QMessageBox)
 from PyQt5.QtCore import Qt
 import sys
-from gui_main import SchoolManagementSystem  # Import your main GUI class
+import threading
 
 
 class LoginPage(QDialog):
@@ -41,13 +41,26 @@ class LoginPage(QDialog):
             QMessageBox.warning(self, "Login Failed", "Invalid username or password!")
 
 
+def prepare_database_in_background():
+    """Import the models and apply schema migrations on a background thread"""
+    def prepare_database():
+        from db_models import ensure_schema
+        ensure_schema()
+    threading.Thread(target=prepare_database, daemon=True).start()
+
+
 if __name__ == "__main__":
     app = QApplication(sys.argv)
     
+    # Bring the database schema up to date while the user logs in
+    prepare_database_in_background()
+    
     # Show login page
     login = LoginPage()
     if login.exec() == QDialog.Accepted:
-        # Open main application after successful login
+        # Open main application after successful login; imported here so the
+        # login dialog does not wait for it
+        from gui_main import SchoolManagementSystem
         main_window = SchoolManagementSystem()
         main_window.show()
         sys.exit(app.exec())
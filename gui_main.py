@@ -1,27 +1,83 @@
 # gui_main.py
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QTabWidget, 
                            QVBoxLayout, QHBoxLayout, QFormLayout, QPushButton, 
-                           QLabel, QLineEdit, QMessageBox, QTableWidget, 
-                           QTableWidgetItem, QComboBox, QSpinBox, QDoubleSpinBox)
-from PyQt5.QtCore import Qt
+                           QLabel, QLineEdit, QMessageBox, QTableView, 
+                           QComboBox, QSpinBox, QDoubleSpinBox, QProgressBar,
+                           QFileDialog, QInputDialog, QDialog, QPlainTextEdit)
+from PyQt5.QtCore import Qt, pyqtSignal
+import os
 import sys
-from sqlalchemy.orm import sessionmaker
-from sqlalchemy import create_engine
-from sqlalchemy.exc import SQLAlchemyError
 
 # Import from models.py
-from db_models import Base, Student, Course, Grade, enrollment
+from db_models import engine, open_session
+from gui_models import (StudentsTableModel, CoursesTableModel, EnrollmentsTableModel, GradesTableModel,
+                        ReportTableModel)
+from gui_workers import ActionMonitor, ChangeNotifier, DatabaseTaskRunner
+from db_import import KINDS, IMPORT_CHUNK_SIZE, import_file
+import db_export
+from db_enrollment import ENROLLED, NOT_FOUND, enroll
+from db_search import search_students, search_courses
+from gui_search import SearchSelect
+from db_instrument import recent_actions
+from db_analytics import REPORTS, clear_cache, semesters
+from db_backup import SnapshotScheduler, take_snapshot
+from db_service import add_student, add_course, add_grade, enroll_numbers, recompute_gpas, run_report
+
 
 class SchoolManagementSystem(QMainWindow):
+    # Emitted from the import worker thread; delivered on the UI thread
+    import_progress = pyqtSignal(str)
+
     def __init__(self):
         super().__init__()
         self.setWindowTitle("School Management System")
         self.setGeometry(100, 100, 800, 600)
         
-        # Initialize database connection
-        self.engine = create_engine('sqlite:///school.db', echo=True)
-        Session = sessionmaker(bind=self.engine)
-        self.session = Session()
+        # Initialize database connection; all queries run on the runner's
+        # worker threads, each task with its own short-lived session
+        self.engine = engine
+        self.Session = open_session
+        self.db = DatabaseTaskRunner(self.Session, self)
+        self.db.task_failed.connect(self.show_error)
+        
+        # Committed writes are patched into the tables and selectors as deltas
+        self.changes = ChangeNotifier(self)
+        self.changes.changed.connect(self.apply_changes)
+        
+        # Busy indicator shown while any query is in flight
+        self.busy_indicator = QProgressBar()
+        self.busy_indicator.setRange(0, 0)
+        self.busy_indicator.setMaximumWidth(120)
+        self.busy_indicator.hide()
+        self.statusBar().addPermanentWidget(self.busy_indicator)
+        self.db.busy_changed.connect(self.busy_indicator.setVisible)
+        
+        # Query count and time of each finished action, in the status bar
+        self.actions = ActionMonitor(self)
+        self.actions.finished.connect(self.show_action_summary)
+        
+        # File menu
+        file_menu = self.menuBar().addMenu("File")
+        file_menu.addAction("Import...", self.import_records)
+        file_menu.addAction("Export...", self.export_records)
+        file_menu.addAction("Back Up Now", self.back_up_database)
+        self.import_progress.connect(self.statusBar().showMessage)
+        
+        # Scheduled snapshots (see db_backup), copied on a thread of their own
+        self.snapshots = None
+        backup_minutes = float(os.environ.get('SCHOOL_DB_BACKUP_MINUTES', 0) or 0)
+        if backup_minutes > 0:
+            self.snapshots = SnapshotScheduler(
+                backup_minutes * 60,
+                on_snapshot=lambda path: self.import_progress.emit(f"Snapshot written to {path}"),
+                on_error=lambda error: self.import_progress.emit(f"Scheduled snapshot failed: {error}")
+            )
+            self.snapshots.start()
+        
+        # Tools menu
+        tools_menu = self.menuBar().addMenu("Tools")
+        tools_menu.addAction("Query Diagnostics...", self.show_diagnostics)
+        tools_menu.addAction("Recompute GPAs", self.recompute_gpas)
         
         # Create main widget and layout
         main_widget = QWidget()
@@ -36,49 +92,76 @@ class SchoolManagementSystem(QMainWindow):
         # Initialize UI elements as class attributes
         self.init_ui_elements()
         
-        # Add tabs
-        self.tabs.addTab(self.create_students_tab(), "Students")
-        self.tabs.addTab(self.create_courses_tab(), "Courses")
-        self.tabs.addTab(self.create_enrollment_tab(), "Enrollment")
-        self.tabs.addTab(self.create_grades_tab(), "Grades")
-        
-        # Initial refresh of all data
-        self.refresh_all_data()
+        # Add tabs as empty pages; each is built, and its data loaded, the
+        # first time it is shown
+        self.tab_pages = [
+            ("Students", self.create_students_tab, [self.refresh_students]),
+            ("Courses", self.create_courses_tab, [self.refresh_courses]),
+            ("Enrollment", self.create_enrollment_tab, [self.refresh_enrollments]),
+            ("Grades", self.create_grades_tab, [self.refresh_grades]),
+            ("Reports", self.create_reports_tab, [self.refresh_reports]),
+        ]
+        self.built_tabs = set()
+        for title, _, _ in self.tab_pages:
+            page = QWidget()
+            page_layout = QVBoxLayout()
+            page_layout.setContentsMargins(0, 0, 0, 0)
+            page.setLayout(page_layout)
+            self.tabs.addTab(page, title)
+        self.tabs.currentChanged.connect(self.show_tab)
+        self.show_tab(self.tabs.currentIndex())
 
     def init_ui_elements(self):
-        # Student form elements
-        self.student_number_input = QLineEdit()
-        self.first_name_input = QLineEdit()
-        self.last_name_input = QLineEdit()
-        self.email_input = QLineEdit()
-        
-        # Course form elements
-        self.course_code_input = QLineEdit()
-        self.course_title_input = QLineEdit()
-        self.credits_input = QSpinBox()
-        self.max_students_input = QSpinBox()
-        
-        # Enrollment form elements
-        self.student_select = QComboBox()
-        self.course_select = QComboBox()
-        
-        # Grade form elements
-        self.grade_student_select = QComboBox()
-        self.grade_course_select = QComboBox()
-        self.semester_input = QLineEdit()
-        self.grade_point_input = QDoubleSpinBox()
-        
-        # Initialize tables
-        self.students_table = QTableWidget()
-        self.courses_table = QTableWidget()
-        self.enrollments_table = QTableWidget()
-        self.grades_table = QTableWidget()
+        # Table models; rows are paged in as the views scroll, and nothing is
+        # queried until a model is first refreshed
+        self.students_model = StudentsTableModel(self.db)
+        self.courses_model = CoursesTableModel(self.db)
+        self.enrollments_model = EnrollmentsTableModel(self.db)
+        self.grades_model = GradesTableModel(self.db)
+        self.report_model = ReportTableModel()
+
+    def create_student_select(self):
+        return SearchSelect(self.db, search_students, "Type a student number, name or email...")
+
+    def create_course_select(self):
+        return SearchSelect(self.db, search_courses, "Type a course code or title...")
+
+    def show_tab(self, index):
+        if index < 0 or index in self.built_tabs:
+            return
+        self.built_tabs.add(index)
+        _, build, refreshers = self.tab_pages[index]
+        self.tabs.widget(index).layout().addWidget(build())
+        for refresh in refreshers:
+            refresh()
+
+    def create_table_view(self, model):
+        view = QTableView()
+        view.setModel(model)
+        # Same as setSortingEnabled(True), minus its immediate sort; the
+        # first query is left to the tab's refresh
+        header = view.horizontalHeader()
+        header.setSortIndicator(0, Qt.AscendingOrder)
+        header.setSortIndicatorShown(True)
+        header.setSectionsClickable(True)
+        header.sortIndicatorChanged.connect(model.sort)
+        return view
+
+    def create_filter_input(self, model):
+        filter_input = QLineEdit()
+        filter_input.setPlaceholderText("Filter...")
+        filter_input.textChanged.connect(model.set_filter)
+        return filter_input
 
     def create_students_tab(self):
         tab = QWidget()
         layout = QVBoxLayout()
         
         # Form for adding students
+        self.student_number_input = QLineEdit()
+        self.first_name_input = QLineEdit()
+        self.last_name_input = QLineEdit()
+        self.email_input = QLineEdit()
         form_layout = QFormLayout()
         
         form_layout.addRow("Student Number:", self.student_number_input)
@@ -92,11 +175,10 @@ class SchoolManagementSystem(QMainWindow):
         layout.addLayout(form_layout)
         layout.addWidget(add_button)
         
-        # Table setup
-        self.students_table.setColumnCount(6)
-        self.students_table.setHorizontalHeaderLabels(
-            ["ID", "Student Number", "First Name", "Last Name", "Email", "CGPA"]
-        )
+        # Table setup; the filter is matched against every column by the database
+        self.students_filter = self.create_filter_input(self.students_model)
+        self.students_table = self.create_table_view(self.students_model)
+        layout.addWidget(self.students_filter)
         layout.addWidget(self.students_table)
         
         # Refresh button
@@ -112,6 +194,10 @@ class SchoolManagementSystem(QMainWindow):
         layout = QVBoxLayout()
         
         # Form for adding courses
+        self.course_code_input = QLineEdit()
+        self.course_title_input = QLineEdit()
+        self.credits_input = QSpinBox()
+        self.max_students_input = QSpinBox()
         form_layout = QFormLayout()
         
         self.credits_input.setRange(1, 6)
@@ -128,11 +214,10 @@ class SchoolManagementSystem(QMainWindow):
         layout.addLayout(form_layout)
         layout.addWidget(add_button)
         
-        # Table setup
-        self.courses_table.setColumnCount(5)
-        self.courses_table.setHorizontalHeaderLabels(
-            ["ID", "Code", "Title", "Credits", "Max Students"]
-        )
+        # Table setup; the filter is matched against every column by the database
+        self.courses_filter = self.create_filter_input(self.courses_model)
+        self.courses_table = self.create_table_view(self.courses_model)
+        layout.addWidget(self.courses_filter)
         layout.addWidget(self.courses_table)
         
         refresh_button = QPushButton("Refresh")
@@ -146,21 +231,29 @@ class SchoolManagementSystem(QMainWindow):
         tab = QWidget()
         layout = QVBoxLayout()
         
+        self.student_select = self.create_student_select()
+        self.course_select = self.create_course_select()
+        
         form_layout = QFormLayout()
         form_layout.addRow("Student:", self.student_select)
         form_layout.addRow("Course:", self.course_select)
         
         enroll_button = QPushButton("Enroll")
         enroll_button.clicked.connect(self.enroll_student_in_course)
+        roster_button = QPushButton("Enroll Roster...")
+        roster_button.clicked.connect(self.enroll_roster_in_course)
+        
+        button_layout = QHBoxLayout()
+        button_layout.addWidget(enroll_button)
+        button_layout.addWidget(roster_button)
         
         layout.addLayout(form_layout)
-        layout.addWidget(enroll_button)
+        layout.addLayout(button_layout)
         
-        # Table setup
-        self.enrollments_table.setColumnCount(3)
-        self.enrollments_table.setHorizontalHeaderLabels(
-            ["Student", "Course", "Enrollment Date"]
-        )
+        # Table setup; the filter is matched against every column by the database
+        self.enrollments_filter = self.create_filter_input(self.enrollments_model)
+        self.enrollments_table = self.create_table_view(self.enrollments_model)
+        layout.addWidget(self.enrollments_filter)
         layout.addWidget(self.enrollments_table)
         
         refresh_button = QPushButton("Refresh")
@@ -174,6 +267,11 @@ class SchoolManagementSystem(QMainWindow):
         tab = QWidget()
         layout = QVBoxLayout()
         
+        self.grade_student_select = self.create_student_select()
+        self.grade_course_select = self.create_course_select()
+        self.semester_input = QLineEdit()
+        self.grade_point_input = QDoubleSpinBox()
+        
         form_layout = QFormLayout()
         
         self.grade_point_input.setRange(0, 4.0)
@@ -191,11 +289,10 @@ class SchoolManagementSystem(QMainWindow):
         layout.addLayout(form_layout)
         layout.addWidget(add_button)
         
-        # Table setup
-        self.grades_table.setColumnCount(5)
-        self.grades_table.setHorizontalHeaderLabels(
-            ["Student", "Course", "Semester", "Grade", "Date"]
-        )
+        # Table setup; the filter is matched against every column by the database
+        self.grades_filter = self.create_filter_input(self.grades_model)
+        self.grades_table = self.create_table_view(self.grades_model)
+        layout.addWidget(self.grades_filter)
         layout.addWidget(self.grades_table)
         
         refresh_button = QPushButton("Refresh")
@@ -205,154 +302,326 @@ class SchoolManagementSystem(QMainWindow):
         tab.setLayout(layout)
         return tab
 
+    def create_reports_tab(self):
+        tab = QWidget()
+        layout = QVBoxLayout()
+        
+        self.report_select = QComboBox()
+        self.report_select.addItems(list(REPORTS))
+        self.report_semester_select = QComboBox()
+        self.report_semester_select.addItem("All semesters", None)
+        
+        form_layout = QFormLayout()
+        form_layout.addRow("Report:", self.report_select)
+        form_layout.addRow("Semester:", self.report_semester_select)
+        
+        run_button = QPushButton("Run Report")
+        run_button.clicked.connect(self.run_report)
+        self.report_status = QLabel()
+        
+        layout.addLayout(form_layout)
+        layout.addWidget(run_button)
+        layout.addWidget(self.report_status)
+        
+        # Reports are computed whole, so the view neither pages nor sorts
+        self.report_table = QTableView()
+        self.report_table.setModel(self.report_model)
+        layout.addWidget(self.report_table)
+        
+        refresh_button = QPushButton("Refresh")
+        refresh_button.clicked.connect(self.refresh_reports)
+        layout.addWidget(refresh_button)
+        
+        tab.setLayout(layout)
+        return tab
+
     def add_student(self):
-        try:
-            student = Student(
-                student_number=self.student_number_input.text(),
-                first_name=self.first_name_input.text(),
-                last_name=self.last_name_input.text(),
-                email=self.email_input.text()
-            )
-            self.session.add(student)
-            self.session.commit()
-            
-            self.refresh_students()
-            self.clear_student_inputs()
-            QMessageBox.information(self, "Success", "Student added successfully!")
-        except SQLAlchemyError as e:
-            self.session.rollback()
-            QMessageBox.critical(self, "Error", str(e))
+        values = dict(
+            student_number=self.student_number_input.text(),
+            first_name=self.first_name_input.text(),
+            last_name=self.last_name_input.text(),
+            email=self.email_input.text()
+        )
+        self.db.submit(add_student, values, on_result=self.student_added, on_error=self.show_error,
+                       action="add student")
+
+    def student_added(self, _):
+        self.clear_student_inputs()
+        QMessageBox.information(self, "Success", "Student added successfully!")
 
     def add_course(self):
-        try:
-            course = Course(
-                course_code=self.course_code_input.text(),
-                title=self.course_title_input.text(),
-                credits=self.credits_input.value(),
-                max_students=self.max_students_input.value()
-            )
-            self.session.add(course)
-            self.session.commit()
-            
-            self.refresh_courses()
-            self.clear_course_inputs()
-            QMessageBox.information(self, "Success", "Course added successfully!")
-        except SQLAlchemyError as e:
-            self.session.rollback()
-            QMessageBox.critical(self, "Error", str(e))
+        values = dict(
+            course_code=self.course_code_input.text(),
+            title=self.course_title_input.text(),
+            credits=self.credits_input.value(),
+            max_students=self.max_students_input.value()
+        )
+        self.db.submit(add_course, values, on_result=self.course_added, on_error=self.show_error,
+                       action="add course")
+
+    def course_added(self, _):
+        self.clear_course_inputs()
+        QMessageBox.information(self, "Success", "Course added successfully!")
 
     def enroll_student_in_course(self):
-        try:
-            student_id = self.student_select.currentData()
-            course_id = self.course_select.currentData()
-            
-            student = self.session.query(Student).get(student_id)
-            course = self.session.query(Course).get(course_id)
-            
-            if not student or not course:
-                raise ValueError("Student or course not found")
-                
-            if course not in student.courses:
-                student.courses.append(course)
-                self.session.commit()
-                self.refresh_enrollments()
-                QMessageBox.information(self, "Success", "Student enrolled successfully!")
-            else:
-                QMessageBox.warning(self, "Warning", "Student already enrolled in this course")
-        except Exception as e:
-            self.session.rollback()
-            QMessageBox.critical(self, "Error", str(e))
+        student_id = self.student_select.currentData()
+        course_id = self.course_select.currentData()
+        if student_id is None or course_id is None:
+            self.show_selection_warning()
+            return
+        self.db.submit(enroll, student_id, course_id, on_result=self.student_enrolled, on_error=self.show_error)
+
+    def student_enrolled(self, result):
+        if result == ENROLLED:
+            QMessageBox.information(self, "Success", "Student enrolled successfully!")
+        elif result == NOT_FOUND:
+            QMessageBox.critical(self, "Error", "Student or course not found")
+        else:
+            QMessageBox.warning(self, "Warning", f"Not enrolled: {result}")
+
+    def enroll_roster_in_course(self):
+        course_id = self.course_select.currentData()
+        if course_id is None:
+            self.show_selection_warning()
+            return
+        text, ok = QInputDialog.getMultiLineText(
+            self, "Enroll Roster", f"Student numbers to enroll in {self.course_select.currentText()}, one per line:"
+        )
+        numbers = [line.strip() for line in text.splitlines() if line.strip()]
+        if not ok or not numbers:
+            return
+        # The whole roster is enrolled in one transaction
+        self.db.submit(enroll_numbers, course_id, numbers, on_result=self.roster_enrolled, on_error=self.show_error,
+                       action="enroll roster")
+
+    def roster_enrolled(self, outcome):
+        results, unknown = outcome
+        counts = {}
+        for _, _, result in results:
+            counts[result] = counts.get(result, 0) + 1
+        lines = [f"{result}: {count}" for result, count in counts.items()]
+        if unknown:
+            lines.append(f"unknown student numbers: {', '.join(unknown)}")
+        QMessageBox.information(self, "Roster Enrollment", "\n".join(lines) or "Nothing to enroll")
 
     def add_grade_record(self):
-        try:
-            student_id = self.grade_student_select.currentData()
-            course_id = self.grade_course_select.currentData()
-            
-            grade = Grade(
-                student_id=student_id,
-                course_id=course_id,
-                semester=self.semester_input.text(),
-                grade_point=self.grade_point_input.value()
-            )
-            self.session.add(grade)
-            self.session.commit()
-            
-            self.refresh_grades()
-            self.clear_grade_inputs()
-            QMessageBox.information(self, "Success", "Grade added successfully!")
-        except SQLAlchemyError as e:
-            self.session.rollback()
-            QMessageBox.critical(self, "Error", str(e))
+        values = dict(
+            student_id=self.grade_student_select.currentData(),
+            course_id=self.grade_course_select.currentData(),
+            semester=self.semester_input.text(),
+            grade_point=self.grade_point_input.value()
+        )
+        if values['student_id'] is None or values['course_id'] is None:
+            self.show_selection_warning()
+            return
+        self.db.submit(add_grade, values, on_result=self.grade_added, on_error=self.show_error,
+                       action="add grade")
+
+    def grade_added(self, _):
+        self.clear_grade_inputs()
+        QMessageBox.information(self, "Success", "Grade added successfully!")
+
+    def import_records(self):
+        kind, ok = QInputDialog.getItem(self, "Import", "Record type:", KINDS, 0, False)
+        if not ok:
+            return
+        path, _ = QFileDialog.getOpenFileName(
+            self, f"Import {kind}", "", "CSV or JSONL files (*.csv *.jsonl *.json);;All files (*)"
+        )
+        if not path:
+            return
+        reject_path = f"{path}.rejects.jsonl"
+        
+        def report(result):
+            self.import_progress.emit(f"Importing {kind}: {result.imported} imported, {result.rejected} rejected")
+        
+        # The import commits chunk by chunk, so it must not be rerun on a busy error
+        self.db.submit(import_file, kind, path, reject_path, None, IMPORT_CHUNK_SIZE, report,
+                       on_result=lambda result: self.records_imported(result, reject_path),
+                       on_error=self.show_error, action=f"import {kind}", retries=0)
+
+    def records_imported(self, result, reject_path):
+        self.statusBar().clearMessage()
+        self.refresh_all_data()
+        message = f"{result.imported} {result.kind} imported, {result.rejected} rejected."
+        if result.rejected:
+            message += f"\nRejected rows were written to {reject_path}"
+        QMessageBox.information(self, "Import Complete", message)
+
+    def export_records(self):
+        kind, ok = QInputDialog.getItem(self, "Export", "Export:", db_export.KINDS, 0, False)
+        if not ok:
+            return
+        semester = None
+        if kind != 'rosters':
+            semester, ok = QInputDialog.getText(self, "Export", "Semester (leave blank for all):")
+            if not ok:
+                return
+            semester = semester.strip() or None
+        path, _ = QFileDialog.getSaveFileName(
+            self, f"Export {kind}", f"{kind}.csv", "CSV files (*.csv);;JSONL files (*.jsonl)"
+        )
+        if not path:
+            return
+        
+        def report(count):
+            self.import_progress.emit(f"Exporting {kind}: {count} rows")
+        
+        def export(session):
+            return db_export.export_file(session, kind, path, progress=report, semester=semester)
+        
+        self.db.submit(export, on_result=lambda count: self.records_exported(kind, count, path),
+                       on_error=self.show_error, action=f"export {kind}")
+
+    def records_exported(self, kind, count, path):
+        self.statusBar().clearMessage()
+        QMessageBox.information(self, "Export Complete", f"{count} rows of {kind} written to {path}")
+
+    def back_up_database(self):
+        def report(copied, total):
+            self.import_progress.emit(f"Backing up: {copied * 100 // max(total, 1)}%")
+        
+        def back_up(session):
+            return take_snapshot(progress=report)
+        
+        self.db.submit(back_up, on_result=self.database_backed_up, on_error=self.show_error,
+                       action="back up database")
+
+    def database_backed_up(self, path):
+        self.statusBar().clearMessage()
+        QMessageBox.information(self, "Backup Complete", f"Snapshot written and verified:\n{path}")
+
+    def recompute_gpas(self):
+        self.db.submit(recompute_gpas, on_result=self.gpas_recomputed, on_error=self.show_error,
+                       action="recompute GPAs")
+
+    def gpas_recomputed(self, counts):
+        students, student_semesters = counts
+        self.refresh_all_data()
+        QMessageBox.information(self, "GPAs Recomputed",
+                                f"GPA summaries rebuilt for {students} students and {student_semesters} student-semesters")
+
+    def show_error(self, error):
+        QMessageBox.critical(self, "Error", str(error))
+
+    def show_action_summary(self, stats):
+        self.statusBar().showMessage(stats.summary(), 5000)
+
+    def show_diagnostics(self):
+        lines = []
+        for stats in reversed(recent_actions):
+            lines.append(stats.summary())
+            for statement, count in stats.repeated:
+                lines.append(f"    possible N+1, ran {count} times: {' '.join(statement.split())}")
+            for statement, elapsed, plan in stats.slow_queries:
+                lines.append(f"    slow ({elapsed * 1000:.0f} ms): {' '.join(statement.split())}")
+                lines.append(f"        plan: {plan}")
+        
+        dialog = QDialog(self)
+        dialog.setWindowTitle("Query Diagnostics")
+        dialog.resize(800, 400)
+        text = QPlainTextEdit("\n".join(lines) or "No database actions recorded yet")
+        text.setReadOnly(True)
+        text.setLineWrapMode(QPlainTextEdit.NoWrap)
+        layout = QVBoxLayout()
+        layout.addWidget(text)
+        dialog.setLayout(layout)
+        dialog.exec()
+
+    def show_selection_warning(self):
+        QMessageBox.warning(self, "Warning", "Choose a student and a course from the search suggestions")
+
+    def clear_student_inputs(self):
+        self.student_number_input.clear()
+        self.first_name_input.clear()
+        self.last_name_input.clear()
+        self.email_input.clear()
+
+    def clear_course_inputs(self):
+        self.course_code_input.clear()
+        self.course_title_input.clear()
+
+    def clear_grade_inputs(self):
+        self.semester_input.clear()
+        self.grade_point_input.setValue(0)
 
     def refresh_all_data(self):
-        self.refresh_students()
-        self.refresh_courses()
-        self.refresh_enrollments()
-        self.refresh_grades()
-        self.update_student_combos()
-        self.update_course_combos()
+        # Tabs that have not been shown yet load their data when they are
+        refreshers = []
+        for index in sorted(self.built_tabs):
+            for refresh in self.tab_pages[index][2]:
+                if refresh not in refreshers:
+                    refreshers.append(refresh)
+        for refresh in refreshers:
+            refresh()
 
     # [Include all the refresh and helper methods from the previous implementation]
     def refresh_students(self):
-        students = self.session.query(Student).all()
-        self.students_table.setRowCount(len(students))
-        for i, student in enumerate(students):
-            self.students_table.setItem(i, 0, QTableWidgetItem(str(student.id)))
-            self.students_table.setItem(i, 1, QTableWidgetItem(student.student_number))
-            self.students_table.setItem(i, 2, QTableWidgetItem(student.first_name))
-            self.students_table.setItem(i, 3, QTableWidgetItem(student.last_name))
-            self.students_table.setItem(i, 4, QTableWidgetItem(student.email))
-            cgpa = student.calculate_cgpa(self.session)
-            self.students_table.setItem(i, 5, QTableWidgetItem(f"{cgpa:.2f}"))
+        self.students_model.refresh()
 
     def refresh_courses(self):
-        courses = self.session.query(Course).filter_by(is_active=True).all()
-        self.courses_table.setRowCount(len(courses))
-        for i, course in enumerate(courses):
-            self.courses_table.setItem(i, 0, QTableWidgetItem(str(course.id)))
-            self.courses_table.setItem(i, 1, QTableWidgetItem(course.course_code))
-            self.courses_table.setItem(i, 2, QTableWidgetItem(course.title))
-            self.courses_table.setItem(i, 3, QTableWidgetItem(str(course.credits)))
-            self.courses_table.setItem(i, 4, QTableWidgetItem(str(course.max_students)))
+        self.courses_model.refresh()
 
     def refresh_enrollments(self):
-        enrollments = self.session.query(enrollment).all()
-        self.enrollments_table.setRowCount(len(enrollments))
-        for i, enroll in enumerate(enrollments):
-            student = self.session.query(Student).get(enroll.student_id)
-            course = self.session.query(Course).get(enroll.course_id)
-            self.enrollments_table.setItem(i, 0, QTableWidgetItem(f"{student.first_name} {student.last_name}"))
-            self.enrollments_table.setItem(i, 1, QTableWidgetItem(course.course_code))
-            self.enrollments_table.setItem(i, 2, QTableWidgetItem(str(enroll.enrollment_date)))
+        self.enrollments_model.refresh()
 
     def refresh_grades(self):
-        grades = self.session.query(Grade).all()
-        self.grades_table.setRowCount(len(grades))
-        for i, grade in enumerate(grades):
-            student = grade.student
-            course = grade.course
-            self.grades_table.setItem(i, 0, QTableWidgetItem(f"{student.first_name} {student.last_name}"))
-            self.grades_table.setItem(i, 1, QTableWidgetItem(course.course_code))
-            self.grades_table.setItem(i, 2, QTableWidgetItem(grade.semester))
-            self.grades_table.setItem(i, 3, QTableWidgetItem(str(grade.grade_point)))
-            self.grades_table.setItem(i, 4, QTableWidgetItem(str(grade.created_at)))
-
-    def update_student_combos(self):
-        students = self.session.query(Student).all()
-        self.student_select.clear()
-        self.grade_student_select.clear()
-        for student in students:
-            text = f"{student.student_number} - {student.first_name} {student.last_name}"
-            self.student_select.addItem(text, student.id)
-            self.grade_student_select.addItem(text, student.id)
-
-    def update_course_combos(self):
-        courses = self.session.query(Course).filter_by(is_active=True).all()
-        self.course_select.clear()
-        self.grade_course_select.clear()
-        for course in courses:
-            text = f"{course.course_code} - {course.title}"
-            self.course_select.addItem(text, course.id)
+        self.grades_model.refresh()
+
+    def refresh_reports(self):
+        # Bulk imports do not report their rows, so drop every cached report
+        clear_cache()
+        self.db.submit(semesters, key='report_semesters', on_result=self.set_report_semesters)
+        self.run_report()
+
+    def set_report_semesters(self, names):
+        current = self.report_semester_select.currentData()
+        self.report_semester_select.clear()
+        self.report_semester_select.addItem("All semesters", None)
+        for name in names:
+            self.report_semester_select.addItem(name, name)
+        index = self.report_semester_select.findData(current)
+        self.report_semester_select.setCurrentIndex(max(index, 0))
+
+    def run_report(self):
+        name = self.report_select.currentText()
+        semester = self.report_semester_select.currentData()
+        self.report_status.setText("Running...")
+        self.db.submit(run_report, name, semester, key='report', action=f"report {name.lower()}",
+                       on_result=lambda result: self.show_report(name, semester, *result))
+
+    def show_report(self, name, semester, headers, rows):
+        self.report_model.set_report(headers, rows)
+        self.report_status.setText(f"{name}, {semester or 'all semesters'}: {len(rows)} rows")
+
+    def apply_changes(self, changes):
+        """Patch the tables with the rows a commit wrote"""
+        def keys(table, *kinds):
+            return set().union(*(changes.get(table, {}).get(kind, ()) for kind in kinds))
+        
+        # A student's CGPA is shown in the students table, so grade writes
+        # update the affected students' rows
+        self.students_model.apply_changes(
+            keys('students', 'inserted', 'updated') | keys('gpa_summary', 'updated'),
+            keys('students', 'deleted')
+        )
+        self.courses_model.apply_changes(keys('courses', 'inserted', 'updated'), keys('courses', 'deleted'))
+        self.enrollments_model.apply_changes(keys('enrollment', 'inserted', 'updated'), keys('enrollment', 'deleted'))
+        self.grades_model.apply_changes(keys('grades', 'inserted', 'updated'), keys('grades', 'deleted'))
+        
+        # Reports affected by the commit have already been dropped from the cache
+        reports_tab = [title for title, _, _ in self.tab_pages].index("Reports")
+        if reports_tab in self.built_tabs and changes.keys() & {'grades', 'courses', 'students', 'enrollment'}:
+            self.run_report()
+
+    def closeEvent(self, event):
+        if self.snapshots is not None:
+            self.snapshots.stop()
+        self.changes.stop()
+        self.actions.stop()
+        self.db.cancel_all()
+        self.db.pool.waitForDone()
+        super().closeEvent(event)
 
 if __name__ == "__main__":
     app = QApplication(sys.argv)
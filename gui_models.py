@@ -0,0 +1,384 @@
+# gui_models.py
+from bisect import bisect_left
+
+from PyQt5.QtCore import Qt, QAbstractTableModel, QModelIndex
+from sqlalchemy import String, cast, func, or_, select, tuple_
+
+import db_lookup
+from db_models import Student, Course, Grade, enrollment, gpa_summary, summary_gpa
+from db_queries import STUDENT_NAME, enrollment_listing_from, grade_listing_from
+from gui_workers import fetch_rows
+
+
+def _text(value):
+    return '' if value is None else str(value)
+
+
+def _sqlite_order(value):
+    # SQLite sorts numbers before text; mirror that so mixed keys compare
+    if isinstance(value, (int, float)):
+        return (0, value)
+    return (1, value)
+
+
+def _student_name(student):
+    return '' if student is None else student.name
+
+
+def _course_code(course):
+    return '' if course is None else course.course_code
+
+
+class Lookup:
+    """A column displayed from a db_lookup cache.
+
+    The query selects only `key`, the foreign id, and the row carries the
+    cached record in its place; `expression`, the joined column it stands
+    for, is only used when sorting or filtering by the column.
+    """
+
+    def __init__(self, key, expression, cache):
+        self.key = key
+        self.expression = expression
+        self.cache = cache
+
+
+def _selected(expression):
+    return expression.key if isinstance(expression, Lookup) else expression
+
+
+def _searched(expression):
+    return expression.expression if isinstance(expression, Lookup) else expression
+
+
+def fetch_page(session, statement, lookups):
+    """Task body: fetch rows, replacing looked-up ids with their cached records"""
+    rows = fetch_rows(session, statement)
+    for index, cache in lookups:
+        records = cache.get_many(session, {row[index] for row in rows})
+        rows = [row[:index] + (records.get(row[index]),) + row[index + 1:] for row in rows]
+    return rows
+
+
+class _Position:
+    """Where a row sits in the model's ORDER BY, comparable with bisect"""
+    __slots__ = ('values', 'descending')
+
+    def __init__(self, values, descending):
+        self.values = tuple(_sqlite_order(value) for value in values)
+        self.descending = descending
+
+    def __lt__(self, other):
+        if self.descending:
+            return other.values < self.values
+        return self.values < other.values
+
+
+class LazyTableModel(QAbstractTableModel):
+    """Read-only table model that pages rows in from the database on demand.
+
+    Rows are fetched in chunks with keyset pagination (ORDER BY the sort
+    column plus the key columns, then WHERE (sort, keys) > last row seen), so
+    the cost of showing a table depends on how far the user scrolls, not on
+    how many rows it has. Sorting and filtering are done by the database, and
+    every page is fetched on the runner's worker threads.
+
+    After writes, apply_changes patches just the affected rows into the
+    loaded window instead of reloading it.
+
+    Subclasses set `columns` to (header, expression, formatter) tuples,
+    `key_columns` to expressions that uniquely identify a row, and implement
+    `build_query` to add the FROM clause, joins and any fixed filters.
+    `name` labels the model's queries in the instrumentation. A column's
+    expression may be a Lookup, shown from a shared cache instead of a join.
+    """
+    name = 'rows'
+    columns = ()
+    key_columns = ()
+    chunk_size = 200
+
+    def __init__(self, runner, parent=None):
+        super().__init__(parent)
+        self.runner = runner
+        self.sort_column = 0
+        self.sort_order = Qt.AscendingOrder
+        self.filter_text = ''
+        self.rows = []
+        self.positions = []
+        self.key_positions = {}
+        self.last_key = None
+        self.exhausted = False
+        self.loading = False
+        self.generation = 0
+        self.lookups = [(index, expression.cache) for index, (_, expression, _) in enumerate(self.columns)
+                        if isinstance(expression, Lookup)]
+
+    def build_query(self, query):
+        raise NotImplementedError
+
+    def needs_joins(self):
+        """Whether the current sort or filter reads columns that Lookups leave out"""
+        return bool(self.filter_text) or isinstance(self.columns[self.sort_column][1], Lookup)
+
+    def sort_key(self):
+        # NULLs break row-value comparisons, so they are folded into '' (which
+        # SQLite orders after every number); String keeps the raw value so it
+        # can be bound back unchanged for the next page.
+        expression = _searched(self.columns[self.sort_column][1])
+        return func.coalesce(expression, '', type_=String)
+
+    def rows_query(self):
+        """Select display columns, sort key and key columns, with the filter applied"""
+        sort_key = self.sort_key()
+        query = select(
+            *[_selected(expression) for _, expression, _ in self.columns],
+            sort_key,
+            *self.key_columns
+        )
+        query = self.build_query(query)
+
+        if self.filter_text:
+            query = query.filter(or_(*[
+                cast(_searched(expression), String).contains(self.filter_text, autoescape=True)
+                for _, expression, _ in self.columns
+            ]))
+        return query
+
+    def page_query(self):
+        sort_key = self.sort_key()
+        query = self.rows_query()
+        position = tuple_(sort_key, *self.key_columns)
+        order = [sort_key, *self.key_columns]
+        if self.sort_order == Qt.DescendingOrder:
+            if self.last_key is not None:
+                query = query.filter(position < tuple_(*self.last_key))
+            order = [expression.desc() for expression in order]
+        elif self.last_key is not None:
+            query = query.filter(position > tuple_(*self.last_key))
+
+        return query.order_by(*order).limit(self.chunk_size)
+
+    def refresh(self):
+        """Drop every loaded row and fetch the first page again"""
+        self.runner.cancel(self)
+        self.generation += 1
+        self.beginResetModel()
+        self.rows = []
+        self.positions = []
+        self.key_positions = {}
+        self.last_key = None
+        self.exhausted = False
+        self.loading = False
+        self.endResetModel()
+        self.fetchMore()
+
+    def set_filter(self, text):
+        self.filter_text = text.strip()
+        self.refresh()
+
+    # QAbstractTableModel interface
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.columns)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole or not index.isValid():
+            return None
+        return self.rows[index.row()][index.column()]
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole or orientation != Qt.Horizontal:
+            return None
+        return self.columns[section][0]
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and not self.exhausted and not self.loading
+
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid() or self.exhausted or self.loading:
+            return
+        self.loading = True
+        self.runner.submit(fetch_page, self.page_query(), self.lookups, key=self, on_result=self.append_page,
+                           action=f"load {self.name}")
+
+    def append_page(self, page):
+        self.loading = False
+        if len(page) < self.chunk_size:
+            self.exhausted = True
+        if not page:
+            return
+
+        width = len(self.columns)
+        self.last_key = tuple(page[-1][width:])
+        self.beginInsertRows(QModelIndex(), len(self.rows), len(self.rows) + len(page) - 1)
+        for row in page:
+            position = self.position(row[width:])
+            self.rows.append(self.format_row(row))
+            self.positions.append(position)
+            self.key_positions[tuple(row[width + 1:])] = position
+        self.endInsertRows()
+
+    def format_row(self, row):
+        return tuple(formatter(value) for (_, _, formatter), value in zip(self.columns, row))
+
+    def position(self, values):
+        """Position of a row from its (sort key, *key columns) values"""
+        return _Position(values, self.sort_order == Qt.DescendingOrder)
+
+    # Delta updates
+    def apply_changes(self, changed_keys=(), deleted_keys=()):
+        """Patch loaded rows after writes; keys are tuples of key column values.
+
+        Deleted rows are dropped straight away. Inserted or updated rows are
+        re-read with one keyed query and moved to their sorted place, if that
+        place is inside the loaded window; rows past the window are picked up
+        by normal paging.
+        """
+        for key in deleted_keys:
+            self.remove_row(key)
+        changed_keys = list(changed_keys)
+        if not changed_keys:
+            return
+        if len(self.key_columns) == 1:
+            match = self.key_columns[0].in_([key[0] for key in changed_keys])
+        else:
+            match = tuple_(*self.key_columns).in_(changed_keys)
+        generation = self.generation
+        self.runner.submit(
+            fetch_page, self.rows_query().where(match), self.lookups,
+            on_result=lambda rows: self.merge_rows(changed_keys, rows, generation),
+            action=f"update {self.name}"
+        )
+
+    def merge_rows(self, keys, rows, generation):
+        if generation != self.generation:
+            # The model was reloaded since; the reload already has these rows
+            return
+        for key in keys:
+            self.remove_row(key)
+
+        width = len(self.columns)
+        last = None if self.last_key is None else self.position(self.last_key)
+        for row in rows:
+            position = self.position(row[width:])
+            if not self.exhausted and (last is None or last < position):
+                continue
+            index = bisect_left(self.positions, position)
+            self.beginInsertRows(QModelIndex(), index, index)
+            self.rows.insert(index, self.format_row(row))
+            self.positions.insert(index, position)
+            self.key_positions[tuple(row[width + 1:])] = position
+            self.endInsertRows()
+
+    def remove_row(self, key):
+        position = self.key_positions.pop(key, None)
+        if position is None:
+            return
+        index = bisect_left(self.positions, position)
+        self.beginRemoveRows(QModelIndex(), index, index)
+        del self.rows[index]
+        del self.positions[index]
+        self.endRemoveRows()
+
+    def sort(self, column, order=Qt.AscendingOrder):
+        self.sort_column = column
+        self.sort_order = order
+        self.refresh()
+
+
+class StudentsTableModel(LazyTableModel):
+    name = 'students'
+    columns = (
+        ("ID", Student.id, _text),
+        ("Student Number", Student.student_number, _text),
+        ("First Name", Student.first_name, _text),
+        ("Last Name", Student.last_name, _text),
+        ("Email", Student.email, _text),
+        ("CGPA", summary_gpa(gpa_summary), lambda cgpa: f"{cgpa:.2f}"),
+    )
+    key_columns = (Student.id,)
+
+    def build_query(self, query):
+        return query.select_from(Student).outerjoin(
+            gpa_summary, gpa_summary.c.student_id == Student.id
+        )
+
+
+class CoursesTableModel(LazyTableModel):
+    name = 'courses'
+    columns = (
+        ("ID", Course.id, _text),
+        ("Code", Course.course_code, _text),
+        ("Title", Course.title, _text),
+        ("Credits", Course.credits, _text),
+        ("Max Students", Course.max_students, _text),
+    )
+    key_columns = (Course.id,)
+
+    def build_query(self, query):
+        return query.select_from(Course).filter(Course.is_active == True)
+
+
+class EnrollmentsTableModel(LazyTableModel):
+    name = 'enrollments'
+    columns = (
+        ("Student", Lookup(enrollment.c.student_id, STUDENT_NAME, db_lookup.students), _student_name),
+        ("Course", Lookup(enrollment.c.course_id, Course.course_code, db_lookup.courses), _course_code),
+        ("Enrollment Date", enrollment.c.enrollment_date, _text),
+    )
+    key_columns = (enrollment.c.student_id, enrollment.c.course_id)
+
+    def build_query(self, query):
+        if self.needs_joins():
+            return enrollment_listing_from(query)
+        return query.select_from(enrollment)
+
+
+class GradesTableModel(LazyTableModel):
+    name = 'grades'
+    columns = (
+        ("Student", Lookup(Grade.student_id, STUDENT_NAME, db_lookup.students), _student_name),
+        ("Course", Lookup(Grade.course_id, Course.course_code, db_lookup.courses), _course_code),
+        ("Semester", Grade.semester, _text),
+        ("Grade", Grade.grade_point, _text),
+        ("Date", Grade.created_at, _text),
+    )
+    key_columns = (Grade.id,)
+
+    def build_query(self, query):
+        if self.needs_joins():
+            return grade_listing_from(query)
+        return query.select_from(Grade)
+
+
+class ReportTableModel(QAbstractTableModel):
+    """Read-only model for a report that is computed as a whole (see db_analytics)"""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.headers = ()
+        self.rows = []
+
+    def set_report(self, headers, rows):
+        self.beginResetModel()
+        self.headers = headers
+        self.rows = rows
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.headers)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole or not index.isValid():
+            return None
+        return _text(self.rows[index.row()][index.column()])
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole or orientation != Qt.Horizontal:
+            return None
+        return self.headers[section]
@@ -0,0 +1,66 @@
+# gui_search.py
+from PyQt5.QtCore import Qt, QModelIndex
+from PyQt5.QtGui import QStandardItem, QStandardItemModel
+from PyQt5.QtWidgets import QCompleter, QLineEdit
+
+
+class SearchSelect(QLineEdit):
+    """Type-ahead selector for one record.
+
+    Each edit runs search(session, text) on the task runner; the (label, id)
+    pairs it returns are offered in a completer popup. Newer keystrokes
+    supersede searches still in flight. Picking a suggestion selects its id,
+    and editing the text again clears the selection, so currentData() is
+    only ever an id the user chose.
+    """
+
+    def __init__(self, runner, search, placeholder="Search...", parent=None):
+        super().__init__(parent)
+        self.runner = runner
+        self.search = search
+        self.task_key = f'search-{id(self)}'
+        self.selected = None
+        self.setPlaceholderText(placeholder)
+
+        # Suggestions arrive already matched and ranked, so the completer
+        # shows them as they are instead of filtering them again
+        self.matches = QStandardItemModel(self)
+        self.completer = QCompleter(self.matches, self)
+        self.completer.setWidget(self)
+        self.completer.setCompletionMode(QCompleter.UnfilteredPopupCompletion)
+        self.completer.activated[QModelIndex].connect(self.choose)
+        self.textEdited.connect(self.lookup)
+
+    def lookup(self, text):
+        self.selected = None
+        if not text.strip():
+            self.runner.cancel(self.task_key)
+            self.completer.popup().hide()
+            return
+        self.runner.submit(self.search, text, key=self.task_key, on_result=self.show_matches)
+
+    def show_matches(self, matches):
+        self.matches.clear()
+        for label, record_id in matches:
+            item = QStandardItem(label)
+            item.setData(record_id, Qt.UserRole)
+            self.matches.appendRow(item)
+        if matches and self.hasFocus():
+            self.completer.complete()
+        else:
+            self.completer.popup().hide()
+
+    def choose(self, index):
+        self.setText(index.data())
+        self.selected = index.data(Qt.UserRole)
+
+    def currentData(self):
+        """Id of the chosen record, or None if nothing has been picked"""
+        return self.selected
+
+    def currentText(self):
+        return self.text()
+
+    def clear(self):
+        super().clear()
+        self.selected = None
@@ -0,0 +1,180 @@
+# gui_workers.py
+import threading
+
+from PyQt5.QtCore import QCoreApplication, QObject, QRunnable, QThreadPool, pyqtSignal
+
+from db_instrument import add_action_listener, remove_action_listener, track_action
+from db_connection import BUSY_RETRIES
+from db_models import add_change_listener, remove_change_listener, run_unit_of_work
+
+
+def fetch_rows(session, statement):
+    """Task body that runs a select and returns its rows as plain tuples"""
+    return [tuple(row) for row in session.execute(statement)]
+
+
+class TaskSignals(QObject):
+    # task, succeeded, result (or the exception on failure)
+    done = pyqtSignal(object, bool, object)
+
+
+class DatabaseTask(QRunnable):
+    """Runs fn(session, *args) on a pool thread with a session of its own.
+
+    The session is committed if fn returns and rolled back if it raises, so
+    a task is one short transaction; if the database is busy it is run again
+    in a new session (see db_models.run_unit_of_work), up to `retries` times.
+    Tasks that commit part of their work themselves must not be rerun and
+    are submitted with retries=0. Only fn's return
+    value crosses back to the UI thread, which is why tasks should return
+    plain rows rather than ORM instances. The statements it runs are
+    attributed to the named action (see db_instrument).
+    """
+
+    def __init__(self, session_factory, fn, args, key, on_result, on_error, action, retries=BUSY_RETRIES):
+        super().__init__()
+        self.setAutoDelete(False)
+        self.session_factory = session_factory
+        self.action = action
+        self.retries = retries
+        self.fn = fn
+        self.args = args
+        self.key = key
+        self.on_result = on_result
+        self.on_error = on_error
+        self.signals = TaskSignals()
+        self.cancelled = False
+        self.lock = threading.Lock()
+        self.connection = None
+
+    def cancel(self):
+        """Drop the result and interrupt the statement if one is running"""
+        with self.lock:
+            self.cancelled = True
+            if self.connection is not None:
+                self.connection.interrupt()
+
+    def attempt(self, session):
+        with self.lock:
+            if self.cancelled:
+                raise RuntimeError("Task cancelled")
+            self.connection = session.connection().connection.driver_connection
+        try:
+            return self.fn(session, *self.args)
+        finally:
+            # The connection goes back to the pool after the commit; a cancel
+            # must not interrupt its next user
+            with self.lock:
+                self.connection = None
+
+    def run(self):
+        try:
+            with track_action(self.action):
+                result = run_unit_of_work(self.attempt, retries=self.retries,
+                                          session_factory=self.session_factory)
+        except Exception as e:
+            self.signals.done.emit(self, False, e)
+        else:
+            self.signals.done.emit(self, True, result)
+
+
+class DatabaseTaskRunner(QObject):
+    """Queues database work onto a thread pool and reports back on the UI thread.
+
+    Tasks submitted with a key supersede any earlier task with the same key:
+    the old one is removed from the queue, or interrupted if it is already
+    running, and its callbacks never fire. busy_changed reports whether any
+    task is outstanding; failures without an on_error callback are reported
+    through task_failed.
+    """
+    busy_changed = pyqtSignal(bool)
+    task_failed = pyqtSignal(str)
+
+    def __init__(self, session_factory, parent=None, max_threads=4):
+        super().__init__(parent)
+        self.session_factory = session_factory
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(max_threads)
+        self.pending = set()
+        self.current = {}
+
+    def submit(self, fn, *args, key=None, on_result=None, on_error=None, action=None, retries=BUSY_RETRIES):
+        if key is not None:
+            self.cancel(key)
+        action = action or fn.__name__.replace('_', ' ')
+        task = DatabaseTask(self.session_factory, fn, args, key, on_result, on_error, action, retries)
+        task.signals.done.connect(self._task_done)
+        if key is not None:
+            self.current[key] = task
+        self.pending.add(task)
+        if len(self.pending) == 1:
+            self.busy_changed.emit(True)
+        self.pool.start(task)
+        return task
+
+    def cancel(self, key):
+        task = self.current.pop(key, None)
+        if task is None:
+            return
+        task.cancel()
+        if self.pool.tryTake(task):
+            self._finish(task)
+
+    def cancel_all(self):
+        for key in list(self.current):
+            self.cancel(key)
+
+    def wait(self):
+        """Block until every queued task has run and its callback has fired"""
+        while self.pending:
+            self.pool.waitForDone()
+            QCoreApplication.processEvents()
+
+    def _finish(self, task):
+        self.pending.discard(task)
+        if not self.pending:
+            self.busy_changed.emit(False)
+
+    def _task_done(self, task, succeeded, result):
+        if task not in self.pending:
+            return
+        self._finish(task)
+        if task.cancelled:
+            return
+        if task.key is not None and self.current.get(task.key) is task:
+            del self.current[task.key]
+        if succeeded:
+            if task.on_result is not None:
+                task.on_result(result)
+        elif task.on_error is not None:
+            task.on_error(result)
+        else:
+            self.task_failed.emit(str(result))
+
+
+class ChangeNotifier(QObject):
+    """Re-emits committed database changes (see db_models) on the UI thread"""
+    changed = pyqtSignal(object)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        # Emitting from the committing worker thread queues delivery to the
+        # thread this object lives in
+        self.listener = self.changed.emit
+        add_change_listener(self.listener)
+
+    def stop(self):
+        remove_change_listener(self.listener)
+
+
+class ActionMonitor(QObject):
+    """Re-emits finished action statistics (see db_instrument) on the UI thread"""
+    finished = pyqtSignal(object)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.listener = self.finished.emit
+        add_action_listener(self.listener)
+
+    def stop(self):
+        remove_action_listener(self.listener)
@@ -0,0 +1,24 @@
+# tests/conftest.py
+import os
+import sys
+
+import pytest
+
+# The modules live at the top level of the repository
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db_connection import make_engine
+from db_models import upgrade_schema
+
+
+def pytest_configure(config):
+    config.addinivalue_line('markers', "slow: starts several processes; deselect with -m 'not slow'")
+
+
+@pytest.fixture
+def engine(tmp_path):
+    """Engine on a fresh, fully migrated database file"""
+    engine = make_engine(f"sqlite:///{tmp_path / 'school.db'}")
+    upgrade_schema(engine)
+    yield engine
+    engine.dispose()
@@ -0,0 +1,63 @@
+# tests/test_analytics.py
+from datetime import datetime
+
+import pytest
+from sqlalchemy.orm import Session
+
+from db_analytics import clear_cache, deans_list, grade_distribution
+from db_models import Student, Course, Grade
+
+
+def add_cohort(engine, grade_points):
+    """One student per grade point, each with a single 3-credit grade"""
+    now = datetime(2025, 9, 1)
+    with engine.begin() as conn:
+        conn.execute(Course.__table__.insert(), [{'course_code': 'C1', 'title': 'Course 1', 'credits': 3}])
+        conn.execute(Student.__table__.insert(), [
+            {'student_number': f'S{i:04d}', 'first_name': 'First', 'last_name': f'Last{i}',
+             'email': f's{i}@example.org'} for i in range(1, len(grade_points) + 1)
+        ])
+        conn.execute(Grade.__table__.insert(), [
+            {'student_id': i, 'course_id': 1, 'semester': 'Fall 2025', 'grade_point': grade_point,
+             'created_at': now}
+            for i, grade_point in enumerate(grade_points, start=1)
+        ])
+    clear_cache()
+
+
+@pytest.mark.parametrize('students, places', [(10, 1), (30, 3), (50, 5), (5, 1)])
+def test_deans_list_is_the_top_tenth(engine, students, places):
+    add_cohort(engine, [round(4.0 - i * 0.05, 2) for i in range(students)])
+    with Session(engine) as session:
+        ranks = [row[0] for row in deans_list(session)]
+    assert ranks == list(range(1, places + 1))
+
+
+def test_deans_list_includes_ties_at_the_cutoff(engine):
+    # 20 students make two places; the second is shared
+    add_cohort(engine, [4.0, 3.9, 3.9] + [round(3.0 - i * 0.1, 2) for i in range(17)])
+    with Session(engine) as session:
+        rows = deans_list(session)
+    assert [(row[0], row[4]) for row in rows] == [(1, 4.0), (2, 3.9), (2, 3.9)]
+
+
+def test_grade_distribution_is_per_course(engine):
+    now = datetime(2025, 9, 1)
+    with engine.begin() as conn:
+        conn.execute(Course.__table__.insert(), [
+            {'course_code': code, 'title': code, 'credits': 3} for code in ('A1', 'B1')
+        ])
+        conn.execute(Student.__table__.insert(), [
+            {'student_number': f'S{i}', 'first_name': 'First', 'last_name': 'Last', 'email': f's{i}@example.org'}
+            for i in range(1, 5)
+        ])
+        conn.execute(Grade.__table__.insert(), [
+            {'student_id': student_id, 'course_id': course_id, 'semester': 'Fall 2025', 'grade_point': grade_point,
+             'created_at': now}
+            for student_id, course_id, grade_point in
+            [(1, 1, 4.0), (2, 1, 4.0), (3, 1, 3.0), (4, 1, 2.0), (1, 2, 3.0), (2, 2, 3.0)]
+        ])
+    clear_cache()
+    with Session(engine) as session:
+        rows = grade_distribution(session)
+    assert rows == [('A1', 4.0, 2, 50.0), ('A1', 3.0, 1, 25.0), ('A1', 2.0, 1, 25.0), ('B1', 3.0, 2, 100.0)]
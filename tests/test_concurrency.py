@@ -0,0 +1,18 @@
+# tests/test_concurrency.py
+# A short run of benchmarks/concurrency.py: several writer processes on one file.
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmarks'))
+
+from concurrency import stress
+
+
+@pytest.mark.slow
+def test_concurrent_writers_lose_nothing(tmp_path):
+    # stress() fails on lost increments, miscounted grades or enrollments,
+    # GPA summary mismatches, integrity_check problems and stuck workers
+    _, summary, failures = stress(processes=4, iterations=30, timeout=120, directory=str(tmp_path))
+    assert failures == [], summary
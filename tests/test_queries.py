@@ -0,0 +1,59 @@
+# tests/test_queries.py
+# The streaming listings must run one statement whatever the number of rows.
+from datetime import datetime
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from db_models import Student, Course, Grade, enrollment
+from db_queries import iter_enrollments, iter_grades
+
+COURSES = 3
+
+
+@pytest.fixture(params=[10, 2000], ids=['small', 'large'])
+def database(request, engine):
+    """(session, students, statements run) on a fresh database of the given size"""
+    students = request.param
+    now = datetime(2025, 9, 1)
+    with engine.begin() as conn:
+        conn.execute(Course.__table__.insert(), [
+            {'course_code': f'C{i}', 'title': f'Course {i}', 'credits': 3} for i in range(1, COURSES + 1)
+        ])
+        conn.execute(Student.__table__.insert(), [
+            {'student_number': f'S{i:06d}', 'first_name': 'First', 'last_name': f'Last{i}',
+             'email': f's{i}@example.org'} for i in range(1, students + 1)
+        ])
+        conn.execute(enrollment.insert(), [
+            {'student_id': i, 'course_id': course_id, 'enrollment_date': now, 'is_active': True}
+            for i in range(1, students + 1) for course_id in range(1, COURSES + 1)
+        ])
+        conn.execute(Grade.__table__.insert(), [
+            {'student_id': i, 'course_id': course_id, 'semester': 'Fall 2025', 'grade_point': 3.0,
+             'created_at': now}
+            for i in range(1, students + 1) for course_id in range(1, COURSES + 1)
+        ])
+
+    statements = []
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    with Session(engine) as session:
+        yield session, students, statements
+
+
+def test_iter_grades_runs_one_statement(database):
+    session, students, statements = database
+    rows = list(iter_grades(session, batch_size=100))
+    assert len(rows) == students * COURSES
+    assert len(statements) == 1
+
+
+def test_iter_enrollments_runs_one_statement(database):
+    session, students, statements = database
+    rows = list(iter_enrollments(session, batch_size=100))
+    assert len(rows) == students * COURSES
+    assert len(statements) == 1